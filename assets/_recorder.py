@@ -0,0 +1,288 @@
+"""Record an animated HTML page as a GIF using Playwright screenshots + Pillow.
+
+Shared by record_demo.py and record_walkthrough.py; each script only
+supplies its page, viewport and timing.
+"""
+
+import asyncio
+import base64
+import io
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from functools import partial
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+# Optional faster decoders: pillow-simd is a drop-in Pillow replacement, and
+# PyTurboJPEG (with libturbojpeg) decodes the JPEG frames several times faster.
+try:
+    from turbojpeg import TJPF_RGB, TurboJPEG
+    _turbojpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbojpeg = None
+
+# Optional ffmpeg encoder via PyAV, used only with XPLAIN_GIF_FFMPEG=1
+try:
+    import av
+except ImportError:
+    av = None
+
+# Terminal background the frames are composited onto
+BACKGROUND = (13, 17, 23)
+# Chromium serializes screenshots per browser, so each shard gets its own
+SHARDS = 4
+# Frames that differ from the last kept frame in at most this many pixels
+# (e.g. a flickering antialiased pixel) are treated as near-duplicates and dropped
+NEAR_DUPLICATE_PIXELS = 16
+# Channel difference below which a pixel counts as unchanged (JPEG noise)
+PIXEL_TOLERANCE = 16
+
+
+async def _capture_shard(p, html_path, viewport, start_ms, end_ms):
+    """Screencast one slice of the timeline in a dedicated browser.
+
+    Returns (time_ms, jpeg_bytes) pairs, timed from the start of the page animation.
+    """
+    browser = await p.chromium.launch()
+    page = await browser.new_page(viewport=viewport)
+    # Drive the page clock so the shard can jump straight to its offset
+    await page.clock.install()
+    await page.goto(f"file://{Path(html_path).resolve()}")
+    await page.clock.run_for(start_ms)
+
+    frames = []
+    cdp = await page.context.new_cdp_session(page)
+    started = time.time()
+
+    async def on_frame(params):
+        timestamp = params.get("metadata", {}).get("timestamp", time.time())
+        t = start_ms + (timestamp - started) * 1000
+        if t < end_ms:
+            frames.append((t, base64.b64decode(params["data"])))
+        # Chromium stops pushing frames until each one is acknowledged
+        await cdp.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+
+    cdp.on("Page.screencastFrame", on_frame)
+    # Frames are palette-quantized for the GIF anyway, so JPEG is plenty
+    await cdp.send("Page.startScreencast", {
+        "format": "jpeg",
+        "quality": 80,
+        "maxWidth": viewport["width"],
+        "maxHeight": viewport["height"],
+        "everyNthFrame": 1,
+    })
+    await asyncio.sleep((end_ms - start_ms) / 1000)
+    await cdp.send("Page.stopScreencast")
+
+    await browser.close()
+    return frames
+
+
+async def capture_frames(html_path, viewport, total_ms, interval_ms):
+    """Return (time_ms, jpeg_bytes) frames on an `interval_ms` grid, kept in memory."""
+    # Only needed to capture, so encoding works without Playwright installed
+    from playwright.async_api import async_playwright
+
+    span = -(-total_ms // SHARDS)
+
+    async with async_playwright() as p:
+        shards = await asyncio.gather(*(
+            _capture_shard(p, html_path, viewport, start, min(start + span, total_ms))
+            for start in range(0, total_ms, span)
+        ))
+
+    # The screencast pushes frames at paint rate; resample onto the grid so GIF
+    # delays stay above the ~20ms browsers honor. The last paint in a slot wins.
+    slots = {}
+    for shard in shards:
+        for t, data in shard:
+            slots[int(t // interval_ms)] = data
+    frames = [(slot * interval_ms, data) for slot, data in sorted(slots.items())]
+
+    print(f"Captured {len(frames)} frames")
+    return frames
+
+
+def _load_frame(data, bg=BACKGROUND):
+    """Decode an encoded screenshot onto the terminal background as an RGB array."""
+    if _turbojpeg is not None:
+        # JPEG frames carry no alpha, so the decoded RGB array is final
+        return _turbojpeg.decode(data, pixel_format=TJPF_RGB)
+    img = Image.open(io.BytesIO(data))
+    # Screenshots are normally opaque; only pay for a composite when there is alpha
+    if img.mode not in ("RGBA", "LA", "PA") and "transparency" not in img.info:
+        return np.asarray(img.convert("RGB"))
+
+    img = img.convert("RGBA")
+    # Composite onto the terminal background in C, then drop alpha for GIF
+    background = Image.new("RGBA", img.size, (*bg, 255))
+    return np.asarray(Image.alpha_composite(background, img).convert("RGB"))
+
+
+def _distinct_frames(stack):
+    """Indices of the frames worth keeping, always including the first and last.
+
+    Exact repeats are dropped first. A frame is then kept only if more than
+    NEAR_DUPLICATE_PIXELS pixels differ from the last kept frame, so a single
+    new line of terminal text always survives.
+    """
+    changed = np.any(stack[1:] != stack[:-1], axis=(1, 2, 3))
+    candidates = np.concatenate([[0], np.nonzero(changed)[0] + 1])
+
+    kept = [candidates[0]]
+    for j, i in enumerate(candidates[1:], start=1):
+        # Always keep the final frame so the GIF ends on the finished state
+        if j == len(candidates) - 1:
+            kept.append(i)
+            continue
+        diff = np.abs(stack[i].astype(np.int16) - stack[kept[-1]].astype(np.int16))
+        if np.count_nonzero(diff.max(axis=2) > PIXEL_TOLERANCE) > NEAR_DUPLICATE_PIXELS:
+            kept.append(i)
+    return np.array(kept)
+
+
+def _transparent_diff_frames(frames):
+    """Quantize frames to one global palette and blank out unchanged pixels.
+
+    The palette is computed once from a subsample of frames, so every frame
+    shares it and no per-frame local color table is written. Index 0 is
+    reserved as the transparent color. Every pixel that matches the previous
+    frame is set to 0, so the LZW stream only has to encode what actually
+    changed instead of re-encoding the static terminal chrome.
+    """
+    count, height, width, _ = frames.shape
+    sample = Image.fromarray(np.vstack(frames[::max(1, count // 32)]))
+    palette_img = sample.quantize(colors=255, dither=Image.Dither.NONE)
+    palette = b"\xff\x00\xff" + bytes(palette_img.getpalette()[:255 * 3])
+
+    indices = [
+        np.asarray(Image.fromarray(frame).quantize(palette=palette_img, dither=Image.Dither.NONE),
+                   dtype=np.uint8) + 1
+        for frame in frames
+    ]
+    # Walk backwards so each frame is compared against its untouched predecessor
+    for i in range(count - 1, 0, -1):
+        indices[i][indices[i] == indices[i - 1]] = 0
+
+    images = []
+    for arr in indices:
+        img = Image.frombytes("P", (width, height), np.ascontiguousarray(arr).tobytes())
+        img.putpalette(palette)
+        images.append(img)
+    return images
+
+
+def _write_gif_ffmpeg(frames, out_gif, interval_ms):
+    """Encode constant-rate frames with ffmpeg's palettegen + paletteuse filters.
+
+    palettegen builds one palette from every pixel of every frame, and
+    ffmpeg's gif encoder diffs frames itself.
+    """
+    height, width, _ = frames[0].shape
+    rate = Fraction(1000, interval_ms)
+
+    with av.open(str(out_gif), "w") as container:
+        stream = container.add_stream("gif", rate=rate)
+        stream.width, stream.height, stream.pix_fmt = width, height, "pal8"
+
+        graph = av.filter.Graph()
+        source = graph.add_buffer(width=width, height=height, format="rgb24", time_base=1 / rate)
+        split = graph.add("split")
+        palettegen = graph.add("palettegen", "stats_mode=full")
+        paletteuse = graph.add("paletteuse", "dither=bayer:bayer_scale=5")
+        sink = graph.add("buffersink")
+        source.link_to(split)
+        split.link_to(palettegen, 0, 0)
+        split.link_to(paletteuse, 1, 0)
+        palettegen.link_to(paletteuse, 0, 1)
+        paletteuse.link_to(sink)
+        graph.configure()
+
+        for pts, frame in enumerate(frames):
+            video_frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame), format="rgb24")
+            video_frame.pts = pts
+            video_frame.time_base = 1 / rate
+            graph.push(video_frame)
+        # palettegen only emits its palette once it has seen every frame
+        graph.push(None)
+
+        while True:
+            try:
+                encoded = graph.pull()
+            except (av.error.BlockingIOError, av.error.EOFError):
+                break
+            container.mux(stream.encode(encoded))
+        container.mux(stream.encode(None))
+
+
+def create_gif(frames, out_gif, total_ms, interval_ms, bg=BACKGROUND):
+    if not frames:
+        print("No frames captured!")
+        return
+
+    times = np.array([t for t, _ in frames])
+
+    # Decoding is CPU-bound and independent per frame, so fan it out across cores
+    with ProcessPoolExecutor() as executor:
+        stack = np.stack(list(executor.map(partial(_load_frame, bg=bg), [data for _, data in frames], chunksize=8)))
+
+    # The Pillow path keeps only distinct frames and runs gifsicle, so it usually
+    # produces the smaller GIF; ffmpeg is an explicit opt-in
+    if os.environ.get("XPLAIN_GIF_FFMPEG") == "1" and av is not None:
+        # ffmpeg wants a constant frame rate: repeat the latest frame for every
+        # grid slot the screencast skipped (views only, no copies)
+        grid = np.arange(0, total_ms, interval_ms)
+        latest = np.maximum(np.searchsorted(times, grid, side="right") - 1, 0)
+        try:
+            _write_gif_ffmpeg([stack[i] for i in latest], out_gif, interval_ms)
+            print(f"GIF saved to {out_gif} via ffmpeg ({len(grid)} frames)")
+            return
+        except Exception as exc:
+            print(f"ffmpeg GIF encoding failed ({exc}), falling back to Pillow")
+
+    keep_idx = _distinct_frames(stack)
+    durations = np.diff(np.append(times[keep_idx], total_ms)).astype(int).tolist()
+
+    deduped = _transparent_diff_frames(stack[keep_idx])
+    del stack
+
+    # gifsicle's optimizer beats Pillow's, so only fall back to it without one
+    gifsicle = shutil.which("gifsicle")
+
+    deduped[0].save(
+        str(out_gif),
+        save_all=True,
+        append_images=deduped[1:],
+        duration=durations,
+        loop=0,
+        palette=deduped[0].getpalette(),
+        transparency=0,
+        disposal=1,
+        optimize=gifsicle is None,
+        version="GIF89a",
+    )
+    if gifsicle:
+        # Write to a side file so a failed run keeps the unoptimized GIF
+        optimized = Path(out_gif).with_suffix(".opt.gif")
+        result = subprocess.run(
+            [gifsicle, "-O3", "--lossy=80", "-o", str(optimized), str(out_gif)],
+            capture_output=True, text=True, check=False,
+        )
+        if result.returncode == 0:
+            optimized.replace(out_gif)
+        else:
+            # --lossy needs gifsicle >= 1.92
+            optimized.unlink(missing_ok=True)
+            print(f"Warning: gifsicle failed, keeping the unoptimized GIF: {result.stderr.strip()}")
+    print(f"GIF saved to {out_gif} ({len(deduped)} unique frames)")
+
+
+async def record(html_path, out_gif, viewport, total_ms, interval_ms, bg=BACKGROUND):
+    """Screencast `html_path` for `total_ms` and write `out_gif` on an `interval_ms` grid."""
+    frames = await capture_frames(html_path, viewport, total_ms, interval_ms)
+    create_gif(frames, out_gif, total_ms, interval_ms, bg)
@@ -12,34 +12,41 @@ PAGES = [
 ]
 
 
+async def render_one(context, html_file, png_file):
+    page = await context.new_page()
+    await page.goto(f"file://{(ASSETS / html_file).resolve()}")
+    await page.evaluate("document.fonts.ready")  # wait for fonts, not a fixed sleep
+
+    # Get the .term element bounding box for tight crop
+    term = page.locator(".term")
+    box = await term.bounding_box()
+    if box:
+        await page.screenshot(
+            path=str(ASSETS / png_file),
+            clip={
+                "x": max(0, box["x"] - 20),
+                "y": max(0, box["y"] - 20),
+                "width": box["width"] + 40,
+                "height": box["height"] + 40,
+            },
+        )
+    else:
+        await page.screenshot(path=str(ASSETS / png_file))
+
+    print(f"✓ {png_file}")
+    await page.close()
+
+
 async def main():
     async with async_playwright() as p:
         browser = await p.chromium.launch()
+        context = await browser.new_context(viewport={"width": 960, "height": 800})
 
-        for html_file, png_file in PAGES:
-            page = await browser.new_page(viewport={"width": 960, "height": 800})
-            await page.goto(f"file://{(ASSETS / html_file).resolve()}")
-            await page.wait_for_timeout(2000)  # wait for fonts
-
-            # Get the .term element bounding box for tight crop
-            term = page.locator(".term")
-            box = await term.bounding_box()
-            if box:
-                await page.screenshot(
-                    path=str(ASSETS / png_file),
-                    clip={
-                        "x": max(0, box["x"] - 20),
-                        "y": max(0, box["y"] - 20),
-                        "width": box["width"] + 40,
-                        "height": box["height"] + 40,
-                    },
-                )
-            else:
-                await page.screenshot(path=str(ASSETS / png_file))
-
-            print(f"✓ {png_file}")
-            await page.close()
+        await asyncio.gather(*(
+            render_one(context, html_file, png_file) for html_file, png_file in PAGES
+        ))
 
+        await context.close()
         await browser.close()
 
 
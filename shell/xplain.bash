@@ -6,6 +6,29 @@
 # After any command fails, type `wtf` to explain what went wrong
 alias wtf='xplain wtf'
 
+# Export the last exit code for `xplain wtf` (it still re-runs the command
+# for its error output unless $XPLAIN_LAST_STDERR names a file holding the
+# captured stderr), and append the command to HISTFILE
+# right away (bash otherwise only writes history on exit)
+_xplain_record_exit() {
+    export XPLAIN_LAST_EXIT=$?
+    history -a
+}
+# Must run first in PROMPT_COMMAND so $? is still the command's status.
+# Added only once, so re-sourcing this file is harmless.
+if [[ "$(declare -p PROMPT_COMMAND 2>/dev/null)" == "declare -a"* ]]; then
+    # bash 5.1+ array form
+    case " ${PROMPT_COMMAND[*]} " in
+        *" _xplain_record_exit "*) ;;
+        *) PROMPT_COMMAND=(_xplain_record_exit "${PROMPT_COMMAND[@]}") ;;
+    esac
+else
+    case ";$PROMPT_COMMAND;" in
+        *";_xplain_record_exit;"*) ;;
+        *) PROMPT_COMMAND="_xplain_record_exit${PROMPT_COMMAND:+;$PROMPT_COMMAND}" ;;
+    esac
+fi
+
 # Auto-explain command-not-found errors (bash 4+)
 command_not_found_handle() {
     echo "bash: command not found: $1"
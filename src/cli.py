@@ -5,12 +5,15 @@ A CLI tool powered by GitHub Models API to explain code, commands,
 and errors in multiple languages.
 """
 
+import importlib
+import os
 import typer
 import subprocess
 from typing import Optional
 from typing_extensions import Annotated
+from typer.core import TyperGroup
 
-from .config import config, LANGUAGE_NAMES
+from .config import config, LANGUAGE_NAMES, LANGUAGE_NAMES_JOINED
 from .core import (
     print_banner,
     print_info,
@@ -21,16 +24,51 @@ from .core import (
     get_backend,
     set_model,
     set_tldr_mode,
+    set_cache_enabled,
     BackendNotAvailableError,
     format_language_flag,
     set_output_file,
     console,
 )
-from .config import AVAILABLE_MODELS
-from .commands import cmd, error_cmd, code_cmd, chat, pipe_cmd, diff_cmd, history_cmd, wtf_cmd
+
+# Subcommands registered lazily: name -> (module, callable, help).
+# Their modules are only imported when the command is actually resolved.
+LAZY_COMMANDS: dict[str, tuple[str, str, str]] = {
+    "cmd": (".commands.cmd", "cmd", "Explain shell commands"),
+    "error": (".commands.error", "error_cmd", "Explain errors and suggest fixes"),
+    "code": (".commands.code", "code_cmd", "Explain code files or snippets"),
+    "chat": (".commands.chat", "chat", "Interactive chat mode"),
+    "pipe": (".commands.pipe", "pipe_cmd", "Auto-detect and explain piped input"),
+    "diff": (".commands.diff", "diff_cmd", "Explain git diffs"),
+    "history": (".commands.history", "history_cmd", "Browse explanation history"),
+    "wtf": (".commands.wtf", "wtf_cmd", "Explain the last failed command from shell history"),
+}
+
+
+def _load_command(name: str):
+    """Import and return the callable behind a lazily registered subcommand."""
+    module_name, attr, _ = LAZY_COMMANDS[name]
+    return getattr(importlib.import_module(module_name, __package__), attr)
+
+
+class LazyTyperGroup(TyperGroup):
+    """Typer group that builds subcommands from LAZY_COMMANDS on first lookup."""
+
+    def list_commands(self, ctx):
+        return list(LAZY_COMMANDS) + super().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in LAZY_COMMANDS:
+            return super().get_command(ctx, cmd_name)
+
+        sub_app = typer.Typer(add_completion=False, rich_markup_mode="rich")
+        sub_app.command(name=cmd_name, help=LAZY_COMMANDS[cmd_name][2])(_load_command(cmd_name))
+        return typer.main.get_command(sub_app)
+
 
 # Create main app
 app = typer.Typer(
+    cls=LazyTyperGroup,
     name="xplain",
     help="\U0001f680 AI-powered CLI tool to explain code, commands, and errors",
     add_completion=True,
@@ -56,6 +94,10 @@ def main_callback(
         bool,
         typer.Option("--tldr", help="Get a one-line TL;DR explanation instead of detailed output")
     ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Always ask the AI, bypassing cached explanations")
+    ] = False,
 ):
     """Global options applied before any subcommand."""
     if output:
@@ -67,17 +109,8 @@ def main_callback(
         set_model(model)
     if tldr:
         set_tldr_mode(True)
-
-
-# Register subcommands
-app.command(name="cmd", help="Explain shell commands")(cmd)
-app.command(name="error", help="Explain errors and suggest fixes")(error_cmd)
-app.command(name="code", help="Explain code files or snippets")(code_cmd)
-app.command(name="chat", help="Interactive chat mode")(chat)
-app.command(name="pipe", help="Auto-detect and explain piped input")(pipe_cmd)
-app.command(name="diff", help="Explain git diffs")(diff_cmd)
-app.command(name="history", help="Browse explanation history")(history_cmd)
-app.command(name="wtf", help="Explain the last failed command from shell history")(wtf_cmd)
+    if no_cache:
+        set_cache_enabled(False)
 
 
 @app.command()
@@ -103,6 +136,15 @@ def version():
     console.print(f"Model:  {config.model}")
 
 
+def _gh_authenticated() -> bool:
+    """Check `gh auth status`, treating a hung or missing `gh` as unauthenticated."""
+    try:
+        result = subprocess.run(["gh", "auth", "status"], capture_output=True, timeout=5)
+    except (subprocess.TimeoutExpired, OSError):
+        return False
+    return result.returncode == 0
+
+
 @app.command()
 def check():
     """Check if all dependencies are properly configured."""
@@ -116,14 +158,10 @@ def check():
     if check_copilot_installed():
         print_success("GitHub CLI (gh) is installed")
 
-        # Check if authenticated
-        result = subprocess.run(
-            ["gh", "auth", "status"],
-            capture_output=True,
-            text=True,
-        )
-
-        if result.returncode == 0:
+        # Check if authenticated (a token in the environment is enough on its own)
+        if os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN"):
+            print_success("GitHub token found in environment (GH_TOKEN/GITHUB_TOKEN)")
+        elif _gh_authenticated():
             print_success("GitHub CLI is authenticated")
         else:
             print_error("GitHub CLI is not authenticated")
@@ -176,7 +214,7 @@ def config_cmd(
     if set_lang:
         if set_lang not in LANGUAGE_NAMES:
             print_error(f"Unsupported language: {set_lang}")
-            print_info(f"Available: {', '.join(LANGUAGE_NAMES.keys())}")
+            print_info(f"Available: {LANGUAGE_NAMES_JOINED}")
             raise typer.Exit(1)
 
         # Update environment variable hint
@@ -210,6 +248,8 @@ def config_cmd(
 @app.command()
 def models():
     """List available AI models."""
+    from .config import AVAILABLE_MODELS
+
     console.print("\n[bold cyan]Available AI Models:[/]\n")
 
     current = config.model
@@ -238,7 +278,7 @@ def cmd_alias(
     lang: Optional[str] = None,
 ):
     """Alias for 'cmd' command."""
-    cmd(command, lang)
+    _load_command("cmd")(command, lang)
 
 
 @app.command(name="e", hidden=True)
@@ -248,7 +288,7 @@ def error_alias(
     lang: Optional[str] = None,
 ):
     """Alias for 'error' command."""
-    error_cmd(message, context=context, lang=lang)
+    _load_command("error")(message, context=context, lang=lang)
 
 
 @app.command(name="d", hidden=True)
@@ -259,7 +299,7 @@ def diff_alias(
     verbose: bool = False,
 ):
     """Alias for 'diff' command."""
-    diff_cmd(ref, staged=staged, lang=lang, verbose=verbose)
+    _load_command("diff")(ref, staged=staged, lang=lang, verbose=verbose)
 
 
 def main():
@@ -1,16 +1,35 @@
-"""Command modules for xplain CLI."""
+"""Command modules for xplain CLI.
 
-from .cmd import cmd
-from .error import error_cmd
-from .code import code_cmd
-from .chat import chat
-from .pipe import pipe_cmd, _detect_content_type
-from .diff import diff_cmd
-from .history import history_cmd
-from .wtf import wtf_cmd
+Each command module is imported on first attribute access so that loading
+one subcommand does not pull in every other command's dependencies.
+"""
+
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "cmd": ".cmd",
+    "error_cmd": ".error",
+    "code_cmd": ".code",
+    "chat": ".chat",
+    "pipe_cmd": ".pipe",
+    "_detect_content_type": ".pipe",
+    "diff_cmd": ".diff",
+    "history_cmd": ".history",
+    "wtf_cmd": ".wtf",
+}
 
 __all__ = [
     "cmd", "error_cmd", "code_cmd", "chat",
     "pipe_cmd", "diff_cmd", "history_cmd",
     "wtf_cmd", "_detect_content_type",
 ]
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    # Cache on the package; this also shadows same-named submodules (cmd, chat)
+    globals()[name] = value
+    return value
@@ -0,0 +1,75 @@
+"""Boilerplate shared by the commands that ask the AI for an explanation."""
+
+import typer
+from typing import Callable, Optional
+
+from ..core import (
+    print_error,
+    LoadingSpinner,
+    StreamingExplanation,
+    format_language_flag,
+    CopilotCLIError,
+)
+from ..core.history_store import history
+from ..config import config, LANGUAGE_NAMES, LANGUAGE_NAMES_JOINED
+
+def resolve_language(lang: Optional[str]) -> str:
+    """Return the output language code (--lang or the configured default), exiting if unsupported."""
+    output_lang = lang or config.language
+    if output_lang not in LANGUAGE_NAMES:
+        print_error(
+            f"Unsupported language: {output_lang}\n"
+            f"Supported: {LANGUAGE_NAMES_JOINED}"
+        )
+        raise typer.Exit(1)
+    return output_lang
+
+
+def run_llm(
+    kind: str,
+    query: str,
+    output_lang: str,
+    fn: Callable[..., str],
+    *args,
+    spinner_label: str,
+    title: str,
+    verbose: bool = False,
+    render: bool = True,
+    **kwargs,
+) -> str:
+    """
+    Get an explanation from `fn`, show it, and save it to history.
+
+    `fn` is one of the explain_* helpers (or ask_copilot) and is called with
+    `*args, **kwargs`. With `render`, the answer streams into a panel titled
+    `title`; without it only a spinner is shown and the caller prints the
+    result (e.g. as JSON). Backend and unexpected errors are reported and
+    exit with status 1.
+
+    Returns:
+        The full explanation text
+    """
+    flag = format_language_flag(output_lang)
+    try:
+        if render:
+            with StreamingExplanation(
+                f"{spinner_label} {flag}...",
+                title=title,
+                subtitle=f"{flag} {LANGUAGE_NAMES[output_lang]}",
+            ) as stream:
+                explanation = fn(*args, on_chunk=stream.update, **kwargs)
+        else:
+            with LoadingSpinner(f"{spinner_label} {flag}..."):
+                explanation = fn(*args, **kwargs)
+    except CopilotCLIError as e:
+        print_error(str(e), title="Copilot Error")
+        raise typer.Exit(1)
+    except Exception as e:
+        print_error(f"Unexpected error: {e}", title="Error")
+        if verbose or config.verbose:
+            import traceback
+            traceback.print_exc()
+        raise typer.Exit(1)
+
+    history.add(kind, query, explanation, language=output_lang)
+    return explanation
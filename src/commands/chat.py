@@ -1,23 +1,28 @@
 """Interactive chat mode module."""
 
+import sys
 import typer
-from typing import Optional
+from typing import Callable, Optional
 from typing_extensions import Annotated
+from prompt_toolkit import PromptSession
+from prompt_toolkit.completion import NestedCompleter
+from prompt_toolkit.formatted_text import HTML
+from prompt_toolkit.history import FileHistory
 
 from ..core import (
     chat_with_copilot,
     print_banner,
-    print_explanation,
     print_error,
     print_info,
     print_success,
-    LoadingSpinner,
+    StreamingExplanation,
     format_language_flag,
     console,
     CopilotCLIError,
 )
 from ..core.history_store import history as history_store
-from ..config import config, LANGUAGE_NAMES
+from ..config import config, LANGUAGE_NAMES, LANGUAGE_NAMES_JOINED
+from ._base import resolve_language
 
 def print_chat_help():
     """Print chat mode help."""
@@ -37,6 +42,33 @@ def print_chat_help():
     console.print(help_text)
 
 
+def _create_prompt_session() -> PromptSession:
+    """Build the chat prompt with persistent history and slash-command completion."""
+    completer = NestedCompleter.from_nested_dict({
+        "/help": None,
+        "/lang": {code: None for code in LANGUAGE_NAMES},
+        "/clear": None,
+        "/exit": None,
+        "/quit": None,
+    })
+    return PromptSession(
+        history=FileHistory(str(config.cache_dir / "chat_history")),
+        completer=completer,
+    )
+
+
+def _create_reader() -> Callable[[], str]:
+    """Return a function that reads one chat message.
+
+    Piped or redirected input (e.g. `echo /q | xplain chat`) is read with
+    plain input(), since prompt_toolkit needs a terminal.
+    """
+    if not sys.stdin.isatty():
+        return lambda: input("You> ")
+    read_input = _create_reader()
+    return lambda: session.prompt(HTML("<ansigreen><b>You&gt;</b></ansigreen> "))
+
+
 def chat(
     lang: Annotated[
         Optional[str],
@@ -50,16 +82,7 @@ def chat(
         xplain chat
         xplain chat --lang vi
     """
-    # Use provided language or fall back to config
-    output_lang = lang or config.language
-    
-    # Validate language
-    if output_lang not in LANGUAGE_NAMES:
-        print_error(
-            f"Unsupported language: {output_lang}\n"
-            f"Supported: {', '.join(LANGUAGE_NAMES.keys())}"
-        )
-        raise typer.Exit(1)
+    output_lang = resolve_language(lang)
     
     # Print welcome banner
     print_banner()
@@ -68,12 +91,12 @@ def chat(
     
     # Conversation history
     history: list[dict] = []
+    read_input = _create_reader()
     
     while True:
         try:
             # Get user input
-            console.print("[bold green]You>[/] ", end="")
-            user_input = input().strip()
+            user_input = read_input().strip()
             
             if not user_input:
                 continue
@@ -99,7 +122,7 @@ def chat(
                     parts = user_input.split()
                     if len(parts) < 2:
                         print_info(f"Current language: {format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}")
-                        print_info(f"Available: {', '.join(LANGUAGE_NAMES.keys())}")
+                        print_info(f"Available: {LANGUAGE_NAMES_JOINED}")
                     else:
                         new_lang = parts[1].lower()
                         if new_lang in LANGUAGE_NAMES:
@@ -107,7 +130,7 @@ def chat(
                             print_success(f"Language changed to {format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}")
                         else:
                             print_error(f"Unknown language: {new_lang}")
-                            print_info(f"Available: {', '.join(LANGUAGE_NAMES.keys())}")
+                            print_info(f"Available: {LANGUAGE_NAMES_JOINED}")
                     continue
                 
                 else:
@@ -120,28 +143,22 @@ def chat(
             
             # Get response from Copilot
             try:
-                with LoadingSpinner("Thinking..."):
+                console.print()
+                with StreamingExplanation("Thinking...", title="Copilot") as stream:
                     response = chat_with_copilot(
                         user_input,
                         history,
-                        LANGUAGE_NAMES[output_lang]
+                        LANGUAGE_NAMES[output_lang],
+                        on_chunk=stream.update,
                     )
-                
+                console.print()
+
                 # Add response to history
                 history.append({"role": "assistant", "content": response})
                 
                 # Save to persistent history
                 history_store.add("chat", user_input, response, language=output_lang)
                 
-                # Display response
-                console.print()
-                print_explanation(
-                    response,
-                    title="Copilot",
-                    subtitle=None
-                )
-                console.print()
-                
             except CopilotCLIError as e:
                 print_error(str(e))
                 # Remove the failed user message from history
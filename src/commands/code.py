@@ -1,5 +1,6 @@
 """Code explanation module."""
 
+import itertools
 import typer
 import sys
 from typing import Optional
@@ -9,16 +10,12 @@ from pathlib import Path
 from ..core import (
     explain_code,
     print_code,
-    print_explanation,
     print_error,
     print_info,
-    LoadingSpinner,
-    format_language_flag,
     detect_code_language,
-    CopilotCLIError,
 )
-from ..core.history_store import history
-from ..config import config, LANGUAGE_NAMES
+from ..config import LANGUAGE_NAMES
+from ._base import resolve_language, run_llm
 
 def code_cmd(
     source: Annotated[
@@ -52,16 +49,7 @@ def code_cmd(
         echo "print('hello')" | xplain code -
         xplain code "const x = arr.reduce((a,b) => a+b, 0)" -c javascript
     """
-    # Use provided language or fall back to config
-    output_lang = lang or config.language
-    
-    # Validate language
-    if output_lang not in LANGUAGE_NAMES:
-        print_error(
-            f"Unsupported language: {output_lang}\n"
-            f"Supported: {', '.join(LANGUAGE_NAMES.keys())}"
-        )
-        raise typer.Exit(1)
+    output_lang = resolve_language(lang)
     
     # Get code from various sources
     code_content = ""
@@ -90,22 +78,25 @@ def code_cmd(
         filename = filepath.name
         programming_lang = code_lang or detect_code_language(filename)
         
-        try:
-            code_content = filepath.read_text()
-        except Exception as e:
-            print_error(f"Error reading file: {e}")
-            raise typer.Exit(1)
-        
-        # Handle line range if specified
+        # Parse the line range first so only those lines need to be read
         if lines:
             try:
                 start, end = map(int, lines.split("-"))
-                code_lines = code_content.splitlines()
-                code_content = "\n".join(code_lines[start-1:end])
-                filename = f"{filename} (lines {start}-{end})"
             except ValueError:
                 print_error("Invalid line range format. Use: --lines START-END (e.g., --lines 10-20)")
                 raise typer.Exit(1)
+
+        try:
+            if lines:
+                with filepath.open() as f:
+                    code_content = "".join(itertools.islice(f, max(start - 1, 0), end))
+                code_content = code_content.removesuffix("\n")
+                filename = f"{filename} (lines {start}-{end})"
+            else:
+                code_content = filepath.read_text()
+        except Exception as e:
+            print_error(f"Error reading file: {e}")
+            raise typer.Exit(1)
     
     else:
         # Treat as inline code snippet
@@ -117,38 +108,18 @@ def code_cmd(
     
     # Truncate very long code for display (but send full to Copilot)
     display_code = code_content
-    if len(code_content.splitlines()) > 50:
-        display_lines = code_content.splitlines()
+    # Counting newlines is a cheap probe; only split when truncation may apply
+    display_lines = code_content.splitlines() if code_content.count("\n") >= 50 else []
+    if len(display_lines) > 50:
         display_code = "\n".join(display_lines[:25]) + "\n\n... (truncated for display) ...\n\n" + "\n".join(display_lines[-10:])
     
     # Show the code being analyzed
     print_code(display_code, programming_lang, filename)
     
-    # Get explanation from Copilot
-    try:
-        with LoadingSpinner(f"Analyzing code {format_language_flag(output_lang)}..."):
-            explanation = explain_code(
-                code_content,
-                filename,
-                LANGUAGE_NAMES[output_lang]
-            )
-        
-        print_explanation(
-            explanation,
-            title="Code Explanation",
-            subtitle=f"{format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}"
-        )
-        
-        # Save to history
-        query = filename or source or "stdin"
-        history.add("code", query, explanation, language=output_lang)
-        
-    except CopilotCLIError as e:
-        print_error(str(e), title="Copilot Error")
-        raise typer.Exit(1)
-    except Exception as e:
-        print_error(f"Unexpected error: {e}", title="Error")
-        if verbose:
-            import traceback
-            traceback.print_exc()
-        raise typer.Exit(1)
+    run_llm(
+        "code", filename or source or "stdin", output_lang,
+        explain_code, code_content, filename, LANGUAGE_NAMES[output_lang],
+        spinner_label="Analyzing code",
+        title="Code Explanation",
+        verbose=verbose,
+    )
@@ -1,30 +1,42 @@
 """Diff command — explain git diffs."""
 
-import subprocess
+import re
 import typer
 from typing import Optional
 from typing_extensions import Annotated
 
-from ..core import (
-    explain_diff,
-    print_explanation,
-    print_error,
-    print_info,
-    LoadingSpinner,
-    format_language_flag,
-    CopilotCLIError,
+from ..core import explain_diff, print_error, print_info
+from ..core.process import run_bounded
+from ..config import LANGUAGE_NAMES
+from ._base import resolve_language, run_llm
+
+# Diffs longer than this are truncated to avoid token limits
+MAX_DIFF_CHARS = 8000
+
+# Summary line printed by `git diff --shortstat`
+_SHORTSTAT_RE = re.compile(
+    r"(\d+) files? changed"
+    r"(?:, (\d+) insertions?\(\+\))?"
+    r"(?:, (\d+) deletions?\(-\))?"
 )
-from ..core.history_store import history as history_store
-from ..config import config, LANGUAGE_NAMES
 
-def _get_git_diff(ref: Optional[str] = None, staged: bool = False) -> tuple[str, str]:
+
+def _get_git_diff(
+    ref: Optional[str] = None,
+    staged: bool = False,
+    max_chars: int = MAX_DIFF_CHARS,
+) -> tuple[str, str, tuple[int, int, int], bool]:
     """
-    Get git diff output.
+    Get git diff output, capped at `max_chars` characters of patch.
+
+    Git prints the --shortstat summary ahead of the patch, so the stats
+    come from the same run without scanning the diff text, and cover the
+    whole diff even when the patch is truncated.
 
     Returns:
-        Tuple of (diff_text, description)
+        Tuple of (diff_text, description, (files_changed, additions, deletions), truncated)
     """
-    cmd = ["git", "diff"]
+    cmd = ["git", "diff", "--shortstat", "--patch"]
     description = "unstaged changes"
 
     if staged:
@@ -34,18 +46,27 @@ def _get_git_diff(ref: Optional[str] = None, staged: bool = False) -> tuple[str,
         cmd.append(ref)
         description = f"changes from {ref}"
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        timeout=30,
-    )
+    # Room for the summary line plus max_chars of patch even if every char is 4 UTF-8 bytes
+    # git is killed once the cap is reached, so a huge diff is never produced in full
+    result = run_bounded(cmd, max_bytes=max_chars * 4 + 256, timeout=30)
+    if result.timed_out:
+        raise RuntimeError("git diff timed out after 30s")
+    if not result.truncated and result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip() or "Failed to run git diff")
+
+    truncated = result.truncated
+    output = result.stdout.decode("utf-8", errors="replace").strip()
 
-    if result.returncode != 0:
-        error_msg = result.stderr.strip() or "Failed to run git diff"
-        raise RuntimeError(error_msg)
+    stats = (0, 0, 0)
+    match = _SHORTSTAT_RE.match(output)
+    if match:
+        stats = tuple(int(n or 0) for n in match.groups())
+        output = output[match.end():].strip()
 
-    return result.stdout.strip(), description
+    if len(output) > max_chars:
+        output = output[:max_chars]
+        truncated = True
+    return output, description, stats, truncated
 
 
 def diff_cmd(
@@ -76,20 +97,11 @@ def diff_cmd(
         xplain diff main             # Explain diff from main branch
         xplain diff HEAD~3 --lang vi # Explain in Vietnamese
     """
-    # Use provided language or fall back to config
-    output_lang = lang or config.language
-
-    # Validate language
-    if output_lang not in LANGUAGE_NAMES:
-        print_error(
-            f"Unsupported language: {output_lang}\n"
-            f"Supported: {', '.join(LANGUAGE_NAMES.keys())}"
-        )
-        raise typer.Exit(1)
+    output_lang = resolve_language(lang)
 
     # Get the diff
     try:
-        diff_text, description = _get_git_diff(ref, staged)
+        diff_text, description, (files_changed, additions, deletions), truncated = _get_git_diff(ref, staged)
     except FileNotFoundError:
         print_error("git is not installed or not in PATH")
         raise typer.Exit(1)
@@ -102,10 +114,6 @@ def diff_cmd(
         raise typer.Exit(0)
 
     # Show diff stats
-    files_changed = diff_text.count("diff --git")
-    additions = sum(1 for line in diff_text.splitlines() if line.startswith("+") and not line.startswith("+++"))
-    deletions = sum(1 for line in diff_text.splitlines() if line.startswith("-") and not line.startswith("---"))
-
     print_info(
         f"Analyzing {description}: "
         f"[bold]{files_changed}[/] file(s), "
@@ -113,37 +121,16 @@ def diff_cmd(
         f"[red]-{deletions}[/] deletions"
     )
 
-    # Truncate very large diffs to avoid token limits
-    max_chars = 8000
-    if len(diff_text) > max_chars:
-        print_info(f"[yellow]Diff is large ({len(diff_text)} chars), truncating to {max_chars} chars[/]")
-        diff_text = diff_text[:max_chars] + "\n\n... (truncated)"
-
-    # Get explanation
-    try:
-        with LoadingSpinner(f"Analyzing diff {format_language_flag(output_lang)}..."):
-            explanation = explain_diff(
-                diff_text,
-                ref=ref or ("--staged" if staged else "working tree"),
-                language=LANGUAGE_NAMES[output_lang],
-            )
-
-        print_explanation(
-            explanation,
-            title="Diff Explanation",
-            subtitle=f"{format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}"
-        )
-
-        # Save to history
-        query = ref or ("--staged" if staged else "working tree")
-        history_store.add("diff", f"git diff {query}", explanation, language=output_lang)
-
-    except CopilotCLIError as e:
-        print_error(str(e), title="Backend Error")
-        raise typer.Exit(1)
-    except Exception as e:
-        print_error(f"Unexpected error: {e}", title="Error")
-        if verbose:
-            import traceback
-            traceback.print_exc()
-        raise typer.Exit(1)
+    # Very large diffs were already cut off at the source
+    if truncated:
+        print_info(f"[yellow]Diff is large, truncating to {MAX_DIFF_CHARS} chars[/]")
+        diff_text += "\n\n... (truncated)"
+
+    query = ref or ("--staged" if staged else "working tree")
+    run_llm(
+        "diff", f"git diff {query}", output_lang,
+        explain_diff, diff_text, ref=query, language=LANGUAGE_NAMES[output_lang],
+        spinner_label="Analyzing diff",
+        title="Diff Explanation",
+        verbose=verbose,
+    )
@@ -5,17 +5,9 @@ from typing import Optional
 from typing_extensions import Annotated
 from pathlib import Path
 
-from ..core import (
-    explain_error,
-    print_explanation,
-    print_error,
-    print_info,
-    LoadingSpinner,
-    format_language_flag,
-    CopilotCLIError,
-)
-from ..core.history_store import history
-from ..config import config, LANGUAGE_NAMES
+from ..core import explain_error, print_error, print_info
+from ..config import LANGUAGE_NAMES
+from ._base import resolve_language, run_llm
 
 def error_cmd(
     message: Annotated[
@@ -48,16 +40,7 @@ def error_cmd(
         xplain error "ECONNREFUSED 127.0.0.1:5432" -c "Trying to connect to PostgreSQL"
         xplain error "Segmentation fault" -f ./crash_log.txt
     """
-    # Use provided language or fall back to config
-    output_lang = lang or config.language
-    
-    # Validate language
-    if output_lang not in LANGUAGE_NAMES:
-        print_error(
-            f"Unsupported language: {output_lang}\n"
-            f"Supported: {', '.join(LANGUAGE_NAMES.keys())}"
-        )
-        raise typer.Exit(1)
+    output_lang = resolve_language(lang)
     
     # Build context from various sources
     full_context = context or ""
@@ -76,30 +59,10 @@ def error_cmd(
     # Show the error being analyzed
     print_info(f"Analyzing error: [bold red]{message}[/]")
     
-    # Get explanation from Copilot
-    try:
-        with LoadingSpinner(f"Diagnosing error {format_language_flag(output_lang)}..."):
-            explanation = explain_error(
-                message, 
-                full_context if full_context else None,
-                LANGUAGE_NAMES[output_lang]
-            )
-        
-        print_explanation(
-            explanation,
-            title="Error Analysis & Solutions",
-            subtitle=f"{format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}"
-        )
-        
-        # Save to history
-        history.add("error", message, explanation, language=output_lang)
-        
-    except CopilotCLIError as e:
-        print_error(str(e), title="Copilot Error")
-        raise typer.Exit(1)
-    except Exception as e:
-        print_error(f"Unexpected error: {e}", title="Error")
-        if verbose:
-            import traceback
-            traceback.print_exc()
-        raise typer.Exit(1)
+    run_llm(
+        "error", message, output_lang,
+        explain_error, message, full_context or None, LANGUAGE_NAMES[output_lang],
+        spinner_label="Diagnosing error",
+        title="Error Analysis & Solutions",
+        verbose=verbose,
+    )
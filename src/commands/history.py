@@ -3,7 +3,6 @@
 import typer
 from typing import Optional
 from typing_extensions import Annotated
-from rich.table import Table
 
 from ..core import (
     console,
@@ -87,6 +86,8 @@ def history_cmd(
         return
 
     # Build table
+    from rich.table import Table
+
     table = Table(title=title, show_lines=False, padding=(0, 1))
     table.add_column("#", style="dim", width=4, justify="right")
     table.add_column("Time", style="dim", width=19)
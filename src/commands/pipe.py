@@ -5,19 +5,9 @@ import typer
 from typing import Optional
 from typing_extensions import Annotated
 
-from ..core import (
-    explain_auto,
-    explain_error,
-    explain_code,
-    print_explanation,
-    print_error,
-    print_info,
-    LoadingSpinner,
-    format_language_flag,
-    CopilotCLIError,
-)
-from ..core.history_store import history as history_store
-from ..config import config, LANGUAGE_NAMES
+from ..core import explain_auto, explain_error, explain_code, print_error, print_info
+from ..config import LANGUAGE_NAMES
+from ._base import resolve_language, run_llm
 
 # Patterns that suggest the content is an error/traceback
 ERROR_PATTERNS = [
@@ -56,32 +46,47 @@ ERROR_PATTERNS = [
 ]
 
 
+# Substrings that suggest the content is source code
+CODE_INDICATORS = [
+    "def ", "class ", "import ", "from ",  # Python
+    "function ", "const ", "let ", "var ",  # JS
+    "func ", "package ",  # Go
+    "public ", "private ", "static ",  # Java/C#
+    "#include", "int main",  # C/C++
+]
+
+# Error patterns match case-insensitively, so lowercase them once
+_ERROR_PATTERNS_LOWER = [p.lower() for p in ERROR_PATTERNS]
+
+
+def _line_hits(text: str, patterns: list[str]) -> int:
+    """Count (line, pattern) pairs where the pattern occurs in the line.
+
+    Most patterns don't occur at all, so each is first checked against the
+    whole text and only the ones present are counted line by line.
+    """
+    present = [p for p in patterns if p in text]
+    if not present:
+        return 0
+    return sum(1 for line in text.splitlines() for p in present if p in line)
+
+
 def _detect_content_type(content: str) -> str:
     """Heuristic to detect if content is an error, code, or general output."""
-    lines = content.strip().splitlines()
-    if not lines:
+    content = content.strip()
+    if not content:
         return "unknown"
+    line_count = len(content.splitlines())
 
-    error_score = 0
-    for line in lines:
-        for pattern in ERROR_PATTERNS:
-            if pattern.lower() in line.lower():
-                error_score += 1
+    error_score = _line_hits(content.lower(), _ERROR_PATTERNS_LOWER)
 
     # If more than ~10% of lines match error patterns, treat as error
-    if error_score > 0 and (error_score / len(lines)) > 0.05:
+    if error_score > 0 and (error_score / line_count) > 0.05:
         return "error"
 
     # Check for code-like patterns
-    code_indicators = [
-        "def ", "class ", "import ", "from ",  # Python
-        "function ", "const ", "let ", "var ",  # JS
-        "func ", "package ",  # Go
-        "public ", "private ", "static ",  # Java/C#
-        "#include", "int main",  # C/C++
-    ]
-    code_score = sum(1 for line in lines for ind in code_indicators if ind in line)
-    if code_score > 0 and (code_score / len(lines)) > 0.1:
+    code_score = _line_hits(content, CODE_INDICATORS)
+    if code_score > 0 and (code_score / line_count) > 0.1:
         return "code"
 
     return "auto"
@@ -128,16 +133,8 @@ def pipe_cmd(
         print_error("Received empty input from stdin")
         raise typer.Exit(1)
 
-    # Use provided language or fall back to config
-    output_lang = lang or config.language
-
-    # Validate language
-    if output_lang not in LANGUAGE_NAMES:
-        print_error(
-            f"Unsupported language: {output_lang}\n"
-            f"Supported: {', '.join(LANGUAGE_NAMES.keys())}"
-        )
-        raise typer.Exit(1)
+    output_lang = resolve_language(lang)
+    lang_name = LANGUAGE_NAMES[output_lang]
 
     # Detect content type
     content_type = force_type or _detect_content_type(content)
@@ -149,39 +146,27 @@ def pipe_cmd(
     print_info(f"Detected content type: [bold]{type_label}[/]")
 
     # Truncate display for very long content
-    lines = content.splitlines()
-    if len(lines) > 30:
-        preview = "\n".join(lines[:15]) + f"\n\n... ({len(lines)} lines total) ...\n\n" + "\n".join(lines[-5:])
+    # Only the head and tail are shown, so split those off rather than every line
+    line_count = content.count("\n") + 1
+    if line_count > 30:
+        head = content.split("\n", 15)[:15]
+        tail = content.rsplit("\n", 5)[-5:]
+        preview = "\n".join(head) + f"\n\n... ({line_count} lines total) ...\n\n" + "\n".join(tail)
     else:
         preview = content
     print_info(f"Input preview:\n[dim]{preview[:500]}[/]")
 
-    # Get explanation
-    try:
-        with LoadingSpinner(f"Analyzing input {format_language_flag(output_lang)}..."):
-            if content_type == "error":
-                explanation = explain_error(content, language=LANGUAGE_NAMES[output_lang])
-            elif content_type == "code":
-                explanation = explain_code(content, language=LANGUAGE_NAMES[output_lang])
-            else:
-                explanation = explain_auto(content, content_type=content_type, language=LANGUAGE_NAMES[output_lang])
-
-        print_explanation(
-            explanation,
-            title="Analysis",
-            subtitle=f"{format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}"
-        )
-
-        # Save to history
-        query_preview = content[:200] if len(content) > 200 else content
-        history_store.add("pipe", query_preview, explanation, language=output_lang)
-
-    except CopilotCLIError as e:
-        print_error(str(e), title="Backend Error")
-        raise typer.Exit(1)
-    except Exception as e:
-        print_error(f"Unexpected error: {e}", title="Error")
-        if verbose:
-            import traceback
-            traceback.print_exc()
-        raise typer.Exit(1)
+    if content_type == "error":
+        fn, kwargs = explain_error, {}
+    elif content_type == "code":
+        fn, kwargs = explain_code, {}
+    else:
+        fn, kwargs = explain_auto, {"content_type": content_type}
+
+    run_llm(
+        "pipe", content[:200], output_lang,
+        fn, content, language=lang_name, **kwargs,
+        spinner_label="Analyzing input",
+        title="Analysis",
+        verbose=verbose,
+    )
@@ -2,25 +2,44 @@
 
 import json
 import os
-import subprocess
 import typer
 from typing import Optional
 from typing_extensions import Annotated
 
 from ..core import (
     explain_command,
-    print_explanation,
     print_error,
     print_info,
     print_warning,
-    LoadingSpinner,
-    format_language_flag,
-    CopilotCLIError,
     console,
     ask_copilot,
 )
-from ..core.history_store import history as history_store
-from ..config import config, LANGUAGE_NAMES
+from ..core.process import run_bounded
+from ..config import LANGUAGE_NAMES
+from ._base import resolve_language, run_llm
+
+
+# Only the tail of a history file is needed to find the last command
+HISTORY_TAIL_BYTES = 8192
+
+# Output kept from each stream of a re-run; the prompt gets the last ~2000 chars
+RERUN_MAX_BYTES = 4096
+RERUN_TIMEOUT = 15
+
+
+def _read_tail(path: str, size: int = HISTORY_TAIL_BYTES) -> bytes:
+    """Read the last `size` bytes of a file with one stat and one positioned read."""
+    file_size = os.stat(path).st_size
+    offset = max(0, file_size - size)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, "pread"):
+            return os.pread(fd, file_size - offset, offset)
+        # No pread on Windows
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, file_size - offset)
+    finally:
+        os.close(fd)
 
 
 def _get_last_command_zsh() -> Optional[str]:
@@ -28,13 +47,7 @@ def _get_last_command_zsh() -> Optional[str]:
     histfile = os.environ.get("HISTFILE", os.path.expanduser("~/.zsh_history"))
     try:
         # zsh history can have multi-byte encoding issues; read as bytes
-        with open(histfile, "rb") as f:
-            # Read last few KB to find the last command
-            f.seek(0, 2)
-            size = f.tell()
-            read_size = min(size, 8192)
-            f.seek(size - read_size)
-            data = f.read()
+        data = _read_tail(histfile)
 
         # Decode with error handling
         lines = data.decode("utf-8", errors="replace").strip().splitlines()
@@ -44,8 +57,10 @@ def _get_last_command_zsh() -> Optional[str]:
             line = line.strip()
             if not line:
                 continue
-            if line.startswith(": ") and ";" in line:
-                return line.split(";", 1)[1].strip()
+            if line.startswith(": "):
+                sep = line.find(";")
+                if sep != -1:
+                    return line[sep + 1:].strip()
             return line
     except (FileNotFoundError, PermissionError, OSError):
         pass
@@ -56,8 +71,10 @@ def _get_last_command_bash() -> Optional[str]:
     """Try to read the last command from bash history file."""
     histfile = os.environ.get("HISTFILE", os.path.expanduser("~/.bash_history"))
     try:
-        with open(histfile, "r", errors="replace") as f:
-            lines = f.readlines()
+        # History grows without bound; only the tail holds the last command
+        data = _read_tail(histfile)
+
+        lines = data.decode("utf-8", errors="replace").splitlines()
         for line in reversed(lines):
             line = line.strip()
             if line:
@@ -84,10 +101,55 @@ def _get_last_command() -> Optional[str]:
     return _get_last_command_zsh()
 
 
+def _get_recorded_exit_code() -> Optional[int]:
+    """Exit code of the last command, as exported by the xplain shell hook."""
+    try:
+        return int(os.environ["XPLAIN_LAST_EXIT"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _get_recorded_stderr() -> Optional[str]:
+    """Captured stderr of the last command, from the file named by $XPLAIN_LAST_STDERR.
+
+    The bundled shell hooks only record the exit code; a hook that also
+    captures stderr can point XPLAIN_LAST_STDERR at where it writes it.
+    """
+    path = os.environ.get("XPLAIN_LAST_STDERR")
+    if not path:
+        return None
+    try:
+        data = _read_tail(path, RERUN_MAX_BYTES)
+    except OSError:
+        return None
+    return data.decode("utf-8", errors="replace").strip() or None
+
+
+def _rerun_command(command: str) -> tuple[int, str, str]:
+    """Re-run a command to capture its output. Returns (exit_code, stdout, stderr).
+
+    Verbose commands run to completion with their real exit code; only the
+    head of stdout and the tail of stderr are kept.
+    """
+    try:
+        result = run_bounded(
+            command, max_bytes=RERUN_MAX_BYTES, timeout=RERUN_TIMEOUT, shell=True,
+            kill_on_overflow=False,
+        )
+    except Exception as e:
+        return 1, "", str(e)
+
+    stdout = result.stdout.decode(errors="replace").strip()
+    stderr = result.stderr.decode(errors="replace").strip()
+    if result.timed_out:
+        return 1, stdout, f"{stderr}\n(command timed out after {RERUN_TIMEOUT}s)".strip()
+    return result.returncode, stdout, stderr
+
+
 def _format_as_json(
     explanation: str,
     command: str,
-    exit_code: int,
+    exit_code: Optional[int],
     language: str,
 ) -> str:
     """Format wtf explanation as JSON for stdout."""
@@ -114,6 +176,13 @@ def wtf_cmd(
         bool,
         typer.Option("--json", help="Output explanation as JSON to stdout")
     ] = False,
+    rerun: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--rerun/--no-rerun",
+            help="Re-run the command to capture its output (default: unless a shell hook captured its exit code and stderr)",
+        )
+    ] = None,
 ):
     """
     Explain the last failed command from your shell history.
@@ -124,15 +193,10 @@ def wtf_cmd(
     Examples:
         xplain wtf
         xplain wtf --lang vi
+        xplain wtf --rerun    # Re-run the command to capture its error output
     """
-    output_lang = lang or config.language
-
-    if output_lang not in LANGUAGE_NAMES:
-        print_error(
-            f"Unsupported language: {output_lang}\n"
-            f"Supported: {', '.join(LANGUAGE_NAMES.keys())}"
-        )
-        raise typer.Exit(1)
+    output_lang = resolve_language(lang)
+    lang_name = LANGUAGE_NAMES[output_lang]
 
     # Get the last command from shell history
     last_cmd = _get_last_command()
@@ -154,65 +218,54 @@ def wtf_cmd(
 
     console.print(f"\n[bold yellow]🤔 Last command:[/] [dim]{last_cmd}[/]\n")
 
-    # Try to re-run the command to capture the error output
-    print_info("Re-running command to capture output...")
-    try:
-        result = subprocess.run(
-            last_cmd,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=15,
-        )
-        exit_code = result.returncode
-        stderr = result.stderr.strip()
-        stdout = result.stdout.strip()
-    except subprocess.TimeoutExpired:
-        exit_code = 1
-        stderr = "(command timed out after 15s)"
-        stdout = ""
-    except Exception as e:
-        exit_code = 1
-        stderr = str(e)
-        stdout = ""
+    # The shell hook (shell/xplain.zsh, shell/xplain.bash) exports the real exit
+    # code. Only when a hook also captured stderr is there enough to explain the
+    # failure without re-running a possibly slow or destructive command.
+    exit_code = _get_recorded_exit_code()
+    captured = _get_recorded_stderr() if exit_code is not None else None
+    if rerun is None:
+        rerun = captured is None
+
+    stdout, stderr = "", captured or ""
+    if rerun:
+        print_info("Re-running command to capture output...")
+        exit_code, stdout, stderr = _rerun_command(last_cmd)
+    elif not captured and exit_code != 0:
+        print_warning("No output was captured for this command; use `xplain wtf --rerun` to include it.")
 
     if exit_code == 0:
-        console.print("[bold green]✓ The command succeeded this time![/]\n")
+        if rerun:
+            console.print("[bold green]✓ The command succeeded this time![/]\n")
+        else:
+            console.print("[bold green]✓ The last command succeeded.[/]\n")
         print_info("Explaining what it does anyway...")
         # Explain the command itself
-        try:
-            with LoadingSpinner(f"Analyzing command {format_language_flag(output_lang)}..."):
-                explanation = explain_command(last_cmd, LANGUAGE_NAMES[output_lang])
-
-            if json_output:
-                console.print(_format_as_json(explanation, last_cmd, 0, output_lang))
-            else:
-                print_explanation(
-                    explanation,
-                    title="Command Explanation",
-                    subtitle=f"{format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}"
-                )
-            history_store.add("wtf", last_cmd, explanation, language=output_lang)
-        except CopilotCLIError as e:
-            print_error(str(e), title="Backend Error")
-            raise typer.Exit(1)
+        explanation = run_llm(
+            "wtf", last_cmd, output_lang,
+            explain_command, last_cmd, lang_name,
+            spinner_label="Analyzing command",
+            title="Command Explanation",
+            verbose=verbose,
+            render=not json_output,
+        )
+        if json_output:
+            console.print(_format_as_json(explanation, last_cmd, 0, output_lang))
         return
 
     # Command failed — explain the error
     error_output = stderr or stdout or "(no output captured)"
+    exit_label = "unknown" if exit_code is None else str(exit_code)
 
-    console.print(f"[bold red]✗ Exit code {exit_code}[/]")
+    console.print(f"[bold red]✗ Exit code {exit_label}[/]")
     if stderr:
-        console.print(f"[dim]{stderr[:300]}[/]\n")
+        console.print(f"[dim]{stderr[-300:]}[/]\n")
 
-    try:
-        with LoadingSpinner(f"Diagnosing failure {format_language_flag(output_lang)}..."):
-            prompt = f"""A developer ran this command and it failed. Explain what went wrong and how to fix it.
+    prompt = f"""A developer ran this command and it failed. Explain what went wrong and how to fix it.
 
 Command: {last_cmd}
-Exit code: {exit_code}
+Exit code: {exit_label}
 Error output:
-{error_output[:2000]}
+{error_output[-2000:]}
 
 Please provide:
 1. What the command was trying to do
@@ -220,26 +273,15 @@ Please provide:
 3. Step-by-step fix
 4. The corrected command (if applicable)
 
-Language: Respond in {LANGUAGE_NAMES[output_lang]}"""
-            explanation = ask_copilot(prompt)
-
-        if json_output:
-            console.print(_format_as_json(explanation, last_cmd, exit_code, output_lang))
-        else:
-            print_explanation(
-                explanation,
-                title="WTF — What The Failure",
-                subtitle=f"{format_language_flag(output_lang)} {LANGUAGE_NAMES[output_lang]}"
-            )
-
-        history_store.add("wtf", f"{last_cmd} (exit {exit_code})", explanation, language=output_lang)
-
-    except CopilotCLIError as e:
-        print_error(str(e), title="Backend Error")
-        raise typer.Exit(1)
-    except Exception as e:
-        print_error(f"Unexpected error: {e}", title="Error")
-        if verbose:
-            import traceback
-            traceback.print_exc()
-        raise typer.Exit(1)
+Language: Respond in {lang_name}"""
+
+    explanation = run_llm(
+        "wtf", f"{last_cmd} (exit {exit_label})", output_lang,
+        ask_copilot, prompt,
+        spinner_label="Diagnosing failure",
+        title="WTF — What The Failure",
+        verbose=verbose,
+        render=not json_output,
+    )
+    if json_output:
+        console.print(_format_as_json(explanation, last_cmd, exit_code, output_lang))
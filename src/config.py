@@ -3,6 +3,7 @@
 import os
 from pathlib import Path
 from dataclasses import dataclass, field
+from functools import cached_property
 from typing import Literal
 
 from dotenv import load_dotenv
@@ -26,6 +27,9 @@ LANGUAGE_NAMES: dict[str, str] = {
     "ru": "Русский",
 }
 
+# Precomputed for "Supported: ..." / "Available: ..." messages
+LANGUAGE_NAMES_JOINED = ", ".join(LANGUAGE_NAMES)
+
 DEFAULT_LANGUAGE: SupportedLang = "en"
 
 # Available AI models on GitHub Models API
@@ -54,14 +58,20 @@ class Config:
     verbose: bool = field(default_factory=lambda: os.getenv("XPLAIN_VERBOSE", "false").lower() == "true")
     model: str = field(default_factory=lambda: os.getenv("XPLAIN_MODEL", DEFAULT_MODEL))
     
-    # Paths
-    config_dir: Path = field(default_factory=lambda: Path.home() / ".config" / "xplain")
-    cache_dir: Path = field(default_factory=lambda: Path.home() / ".cache" / "xplain")
-    
-    def __post_init__(self):
-        """Ensure directories exist."""
-        self.config_dir.mkdir(parents=True, exist_ok=True)
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    # Paths (created on first access, so commands that never touch them skip the mkdir)
+    @cached_property
+    def config_dir(self) -> Path:
+        """Get the config directory, creating it if needed."""
+        path = Path.home() / ".config" / "xplain"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @cached_property
+    def cache_dir(self) -> Path:
+        """Get the cache directory, creating it if needed."""
+        path = Path.home() / ".cache" / "xplain"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
     
     @property
     def language_name(self) -> str:
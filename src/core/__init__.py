@@ -2,6 +2,7 @@
 
 from .copilot import (
     ask_copilot,
+    ask_copilot_many,
     explain_command,
     explain_error,
     explain_code,
@@ -12,6 +13,7 @@ from .copilot import (
     set_model,
     set_tldr_mode,
     is_tldr_mode,
+    set_cache_enabled,
     CopilotCLIError,
     CopilotNotFoundError,
     BackendNotAvailableError,
@@ -29,6 +31,7 @@ from .formatter import (
     print_success,
     print_info,
     LoadingSpinner,
+    StreamingExplanation,
     format_language_flag,
     detect_code_language,
     set_output_file,
@@ -38,6 +41,7 @@ from .formatter import (
 __all__ = [
     # Copilot
     "ask_copilot",
+    "ask_copilot_many",
     "explain_command",
     "explain_error",
     "explain_code",
@@ -48,6 +52,7 @@ __all__ = [
     "set_model",
     "set_tldr_mode",
     "is_tldr_mode",
+    "set_cache_enabled",
     "CopilotCLIError",
     "CopilotNotFoundError",
     "BackendNotAvailableError",
@@ -63,6 +68,7 @@ __all__ = [
     "print_success",
     "print_info",
     "LoadingSpinner",
+    "StreamingExplanation",
     "format_language_flag",
     "detect_code_language",
     "set_output_file",
@@ -5,13 +5,24 @@ Token is obtained from `gh auth token` (if gh CLI is installed) or from
 GH_TOKEN / GITHUB_TOKEN environment variables.
 """
 
+import atexit
+import importlib.util
+import json
+import random
 import subprocess
 import shutil
 import os
-from typing import Optional
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Callable, Iterator, Optional
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
 
-import httpx
+from .formatter import print_warning
+from .response_cache import normalize_error, response_cache
 
 
 class CopilotCLIError(Exception):
@@ -29,6 +40,15 @@ class BackendNotAvailableError(CopilotCLIError):
     pass
 
 
+NO_BACKEND_MESSAGE = (
+    "No AI backend available. Please either:\n"
+    "  1. Install GitHub CLI and authenticate:\n"
+    "     brew install gh && gh auth login && gh auth refresh -s copilot\n"
+    "  2. Set a GH_TOKEN or GITHUB_TOKEN environment variable\n"
+    "You also need an active GitHub Copilot subscription."
+)
+
+
 # ---------------------------------------------------------------------------
 # Backend ABC
 # ---------------------------------------------------------------------------
@@ -56,6 +76,23 @@ class AIBackend(ABC):
                 system_msg = m["content"]
                 break
         return self.ask(user_msg, system_prompt=system_msg, timeout=timeout)
+
+    def ask_stream(self, prompt: str, system_prompt: str = "", timeout: int = 120) -> Iterator[str]:
+        """Send a prompt and yield the response text as it arrives."""
+        # Default: no streaming, yield the whole response at once
+        yield self.ask(prompt, system_prompt=system_prompt, timeout=timeout)
+
+    def ask_messages_stream(self, messages: list[dict], timeout: int = 120) -> Iterator[str]:
+        """Send a list of messages and yield the response text as it arrives."""
+        # Default: no streaming, yield the whole response at once
+        yield self.ask_messages(messages, timeout=timeout)
+
+    async def ask_messages_async(self, messages: list[dict], timeout: int = 120, client=None) -> str:
+        """Async version of ask_messages(); `client` is an optional shared httpx.AsyncClient."""
+        # Default: run the blocking call in a worker thread
+        import asyncio
+
+        return await asyncio.to_thread(self.ask_messages, messages, timeout)
     
     @property
     @abstractmethod
@@ -67,38 +104,147 @@ class AIBackend(ABC):
 # GitHub Models API backend (httpx)
 # ---------------------------------------------------------------------------
 
-_cached_token: Optional[str] = None
+@dataclass
+class _TokenEntry:
+    token: str
+    expires_at: float  # time.monotonic() deadline
 
 
-def _get_github_token() -> Optional[str]:
-    """Get GitHub token from environment or gh CLI (cached after first call)."""
-    global _cached_token
-    if _cached_token is not None:
-        return _cached_token
+# Tokens are re-read after this long, since `gh auth` tokens can be rotated or revoked
+TOKEN_TTL = 300
+# Refresh this long before expiry so a request never starts with a stale token
+TOKEN_REFRESH_MARGIN = 30
+
+_cached_token: Optional[_TokenEntry] = None
+_token_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _which_gh() -> Optional[str]:
+    """Path to the gh CLI, looked up once per process (PATH doesn't change under us)."""
+    return shutil.which("gh")
 
+
+def _read_github_token() -> Optional[str]:
+    """Read the token from GH_TOKEN / GITHUB_TOKEN, else from `gh auth token`."""
     token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
     if token:
-        _cached_token = token
         return token
-    # Try to get from gh auth
-    if shutil.which("gh"):
+    if _which_gh():
         try:
             result = subprocess.run(
                 ["gh", "auth", "token"],
                 capture_output=True, text=True, timeout=10,
             )
             if result.returncode == 0:
-                _cached_token = result.stdout.strip()
-                return _cached_token
+                return result.stdout.strip() or None
         except Exception:
             pass
     return None
 
 
+def _get_github_token() -> Optional[str]:
+    """Get GitHub token from environment or gh CLI (cached for TOKEN_TTL seconds).
+
+    Set XPLAIN_TOKEN_NOCACHE=1 to read it fresh on every call.
+    """
+    global _cached_token
+    if os.environ.get("XPLAIN_TOKEN_NOCACHE") == "1":
+        return _read_github_token()
+
+    entry = _cached_token
+    if entry is not None and time.monotonic() < entry.expires_at - TOKEN_REFRESH_MARGIN:
+        return entry.token
+
+    # One thread refreshes; the others wait and reuse its result
+    with _token_lock:
+        entry = _cached_token
+        if entry is not None and time.monotonic() < entry.expires_at - TOKEN_REFRESH_MARGIN:
+            return entry.token
+        token = _read_github_token()
+        _cached_token = _TokenEntry(token, time.monotonic() + TOKEN_TTL) if token else None
+        return token
+
+
+# Shared client so later requests reuse the open TLS connection
+_HTTP_CLIENT = None
+
+
+def _get_http_client():
+    """Return the shared httpx.Client, creating it on first use."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        # httpx is only needed by this backend; keep it off the CLI startup path
+        import httpx
+
+        _HTTP_CLIENT = httpx.Client(
+            base_url="https://models.github.ai",
+            timeout=httpx.Timeout(120.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=60),
+            # h2 comes with httpx[http2]; fall back to HTTP/1.1 in environments without it
+            http2=importlib.util.find_spec("h2") is not None,
+            headers={"Content-Type": "application/json"},
+        )
+        atexit.register(_close_http_client)
+    return _HTTP_CLIENT
+
+
+def _close_http_client():
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        _HTTP_CLIENT.close()
+        _HTTP_CLIENT = None
+
+
+def _new_async_http_client(transport=None):
+    """Create an httpx.AsyncClient configured like the shared sync client.
+
+    Async clients are bound to the event loop they are used on, so one is
+    made per batch rather than kept at module level. `transport` lets callers
+    plug in another transport (e.g. an aiohttp-based one or a mock).
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        base_url="https://models.github.ai",
+        timeout=httpx.Timeout(120.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=60),
+        http2=transport is None and importlib.util.find_spec("h2") is not None,
+        headers={"Content-Type": "application/json"},
+        transport=transport,
+    )
+
+
+# Requests are retried on rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_ATTEMPTS = 3
+
+
+def _should_retry(status: int) -> bool:
+    return status in RETRY_STATUSES
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before the next attempt (0-based `attempt` just failed).
+
+    Honors a Retry-After header (seconds or HTTP date), otherwise backs off
+    exponentially with jitter.
+    """
+    if retry_after:
+        try:
+            return min(60.0, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                return min(60.0, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+    return min(60.0, 2 ** attempt + random.random())
+
+
 class GitHubModelsBackend(AIBackend):
     """Use GitHub Models API via httpx with a GitHub token."""
     
-    API_URL = "https://models.github.ai/inference/chat/completions"
+    API_PATH = "/inference/chat/completions"
     
     def __init__(self, model: Optional[str] = None):
         if model:
@@ -121,36 +267,93 @@ class GitHubModelsBackend(AIBackend):
     def is_available(self) -> bool:
         return _get_github_token() is not None
     
-    def ask(self, prompt: str, system_prompt: str = "", timeout: int = 120) -> str:
+    def _messages(self, prompt: str, system_prompt: str = "") -> list[dict]:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
-        return self.ask_messages(messages, timeout=timeout)
+        return messages
+
+    def ask(self, prompt: str, system_prompt: str = "", timeout: int = 120) -> str:
+        return self.ask_messages(self._messages(prompt, system_prompt), timeout=timeout)
+
+    def ask_stream(self, prompt: str, system_prompt: str = "", timeout: int = 120) -> Iterator[str]:
+        return self.ask_messages_stream(self._messages(prompt, system_prompt), timeout=timeout)
 
     def ask_messages(self, messages: list[dict], timeout: int = 120) -> str:
         token = _get_github_token()
         if not token:
-            raise BackendNotAvailableError("No GitHub token available")
-        
-        with httpx.Client(timeout=timeout) as client:
-            resp = client.post(
-                self.API_URL,
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "messages": messages,
-                    "model": self._model,
-                    "temperature": 0.4,
-                    "max_tokens": 2048,
-                },
-            )
-        
+            raise BackendNotAvailableError(NO_BACKEND_MESSAGE)
+
+        import httpx
+
+        client = _get_http_client()
+        for attempt in range(MAX_ATTEMPTS):
+            last = attempt == MAX_ATTEMPTS - 1
+            try:
+                resp = client.post(
+                    self.API_PATH,
+                    headers={"Authorization": f"Bearer {token}"},
+                    json=self._payload(messages),
+                    timeout=timeout,
+                )
+            except httpx.TransportError:
+                if last:
+                    raise
+                time.sleep(_retry_delay(attempt))
+                continue
+            if _should_retry(resp.status_code) and not last:
+                time.sleep(_retry_delay(attempt, resp.headers.get("Retry-After")))
+                continue
+            return self._parse_response(resp)
+
+    async def ask_messages_async(self, messages: list[dict], timeout: int = 120, client=None) -> str:
+        token = _get_github_token()
+        if not token:
+            raise BackendNotAvailableError(NO_BACKEND_MESSAGE)
+
+        if client is None:
+            async with _new_async_http_client() as client:
+                return await self.ask_messages_async(messages, timeout=timeout, client=client)
+
+        import asyncio
+        import httpx
+
+        for attempt in range(MAX_ATTEMPTS):
+            last = attempt == MAX_ATTEMPTS - 1
+            try:
+                resp = await client.post(
+                    self.API_PATH,
+                    headers={"Authorization": f"Bearer {token}"},
+                    json=self._payload(messages),
+                    timeout=timeout,
+                )
+            except httpx.TransportError:
+                if last:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            if _should_retry(resp.status_code) and not last:
+                await asyncio.sleep(_retry_delay(attempt, resp.headers.get("Retry-After")))
+                continue
+            return self._parse_response(resp)
+
+    def _payload(self, messages: list[dict], stream: bool = False) -> dict:
+        payload = {
+            "messages": messages,
+            "model": self._model,
+            "temperature": 0.4,
+            "max_tokens": 2048,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @staticmethod
+    def _parse_response(resp) -> str:
         if resp.status_code != 200:
             raise CopilotCLIError(f"GitHub Models API HTTP {resp.status_code}: {resp.text[:300]}")
-        
+
         try:
             data = resp.json()
             if "error" in data:
@@ -161,6 +364,65 @@ class GitHubModelsBackend(AIBackend):
         except (KeyError, IndexError) as exc:
             raise CopilotCLIError(f"Failed to parse API response: {exc}")
 
+    def ask_messages_stream(self, messages: list[dict], timeout: int = 120) -> Iterator[str]:
+        """Like ask_messages(), but yield content deltas from the server-sent event stream."""
+        token = _get_github_token()
+        if not token:
+            raise BackendNotAvailableError(NO_BACKEND_MESSAGE)
+
+        import httpx
+
+        client = _get_http_client()
+        started = False
+        for attempt in range(MAX_ATTEMPTS):
+            last = attempt == MAX_ATTEMPTS - 1
+            try:
+                with client.stream(
+                    "POST",
+                    self.API_PATH,
+                    headers={"Authorization": f"Bearer {token}"},
+                    json=self._payload(messages, stream=True),
+                    timeout=timeout,
+                ) as resp:
+                    if resp.status_code == 200:
+                        for delta in self._iter_sse(resp):
+                            started = True
+                            yield delta
+                        return
+
+                    resp.read()
+                    if not _should_retry(resp.status_code) or last:
+                        raise CopilotCLIError(f"GitHub Models API HTTP {resp.status_code}: {resp.text[:300]}")
+                    delay = _retry_delay(attempt, resp.headers.get("Retry-After"))
+            except httpx.TransportError:
+                # Once text has been shown, a retry would repeat it
+                if started or last:
+                    raise
+                delay = _retry_delay(attempt)
+            time.sleep(delay)
+
+    @staticmethod
+    def _iter_sse(resp) -> Iterator[str]:
+        """Yield content deltas from a streaming chat completions response."""
+        for line in resp.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+            try:
+                data = json.loads(payload)
+                if "error" in data:
+                    raise CopilotCLIError(
+                        f"GitHub Models API error: {data['error'].get('message', data['error'])}"
+                    )
+                choices = data.get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+            except (json.JSONDecodeError, AttributeError) as exc:
+                raise CopilotCLIError(f"Failed to parse API response: {exc}")
+            if delta:
+                yield delta
+
 
 # Keep old names as aliases for backward compatibility in tests
 GhModelsBackend = GitHubModelsBackend
@@ -187,38 +449,34 @@ def set_model(model: str):
 
 
 def _select_backend() -> AIBackend:
-    """Select the best available backend."""
+    """Return the backend to use, without checking that it is usable yet.
+
+    The token is only looked up when a request is actually sent, so
+    cache hits never need `gh`; a missing token surfaces then as
+    BackendNotAvailableError.
+    """
     global _backend_instance
-    if _backend_instance is not None:
-        return _backend_instance
-    
-    backend = GitHubModelsBackend(model=_selected_model)
-    if backend.is_available():
-        _backend_instance = backend
-        return backend
-    
-    raise BackendNotAvailableError(
-        "No AI backend available. Please either:\n"
-        "  1. Install GitHub CLI and authenticate:\n"
-        "     brew install gh && gh auth login && gh auth refresh -s copilot\n"
-        "  2. Set a GH_TOKEN or GITHUB_TOKEN environment variable\n"
-        "You also need an active GitHub Copilot subscription."
-    )
+    if _backend_instance is None:
+        _backend_instance = GitHubModelsBackend(model=_selected_model)
+    return _backend_instance
 
 
 def get_backend() -> AIBackend:
-    """Get the current AI backend."""
-    return _select_backend()
+    """Get the current AI backend, raising BackendNotAvailableError if it can't be used."""
+    backend = _select_backend()
+    if not backend.is_available():
+        raise BackendNotAvailableError(NO_BACKEND_MESSAGE)
+    return backend
 
 
 def check_copilot_installed() -> bool:
     """Check if GitHub CLI is installed and available."""
-    return shutil.which("gh") is not None
+    return _which_gh() is not None
 
 
 def ensure_copilot_available():
     """Ensure an AI backend is available, raise error if not."""
-    _select_backend()
+    get_backend()
 
 
 # ---------------------------------------------------------------------------
@@ -239,6 +497,12 @@ SYSTEM_PROMPT_TLDR = (
 
 _tldr_mode: bool = False
 
+_cache_enabled: bool = True
+
+# Opt-in: also answer errors from the cache when a previous one only differed
+# in paths, line/column numbers or addresses
+NORMALIZED_ERROR_CACHE = os.environ.get("XPLAIN_CACHE_NORMALIZE") == "1"
+
 
 def set_tldr_mode(enabled: bool):
     """Enable or disable TL;DR mode for ultra-short responses."""
@@ -251,17 +515,165 @@ def is_tldr_mode() -> bool:
     return _tldr_mode
 
 
-def ask_copilot(prompt: str, verbose: bool = False) -> str:
-    """Send a prompt and get the response from the best available backend."""
+def set_cache_enabled(enabled: bool):
+    """Enable or disable the response cache. Disabled by --no-cache CLI flag."""
+    global _cache_enabled
+    _cache_enabled = enabled
+
+
+def _ask_backend(
+    backend: AIBackend,
+    prompt: str,
+    system: str,
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Ask the backend, streaming into `on_chunk` when given."""
+    if on_chunk is None:
+        return backend.ask(prompt, system_prompt=system)
+
+    return _collect(backend.ask_stream(prompt, system_prompt=system), on_chunk)
+
+
+def _collect(stream: Iterator[str], on_chunk: Callable[[str], None]) -> str:
+    """Pass each streamed piece to `on_chunk` and return the whole response."""
+    chunks = []
+    for chunk in stream:
+        chunks.append(chunk)
+        on_chunk(chunk)
+    return "".join(chunks).strip()
+
+
+# Requests being answered right now, by cache key; identical concurrent calls share one
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key: str, fn: Callable[[], str]) -> tuple[str, bool]:
+    """Run `fn`, or wait for the identical call already running.
+
+    Returns the response and whether this call made the request.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        return future.result(), False
+
+    try:
+        response = fn()
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+    future.set_result(response)
+    return response, True
+
+
+def ask_copilot(
+    prompt: str,
+    verbose: bool = False,
+    normalized: bool = False,
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Send a prompt and get the response from the best available backend.
+
+    Identical requests (same backend/model, system prompt and prompt) are
+    answered from the on-disk response cache without calling the API. With
+    `normalized`, a second key built from normalize_error(prompt) also lets
+    errors that only differ in line/column numbers, addresses or directories
+    hit.
+    With `on_chunk`, the response is streamed and each piece is passed to
+    it as it arrives (a cache hit arrives as one piece).
+    """
     backend = _select_backend()
     system = SYSTEM_PROMPT_TLDR if _tldr_mode else SYSTEM_PROMPT
-    return backend.ask(prompt, system_prompt=system)
+    keys = [response_cache.make_key(backend.name, system, prompt)]
+
+    if _cache_enabled:
+        if normalized:
+            keys.append(response_cache.make_key(backend.name, system, normalize_error(prompt)))
+        for key in keys:
+            cached = response_cache.get(key)
+            if cached is not None:
+                if on_chunk:
+                    on_chunk(cached)
+                return cached
+
+    response, leader = _single_flight(keys[0], lambda: _ask_backend(backend, prompt, system, on_chunk))
+    if not leader:
+        # Answered by an identical call running in another thread
+        if on_chunk:
+            on_chunk(response)
+        return response
+
+    if _cache_enabled:
+        for key in keys:
+            response_cache.set(key, response)
+    return response
+
+
+async def _ask_many(
+    backend: AIBackend,
+    message_lists: list[list[dict]],
+    concurrency: int,
+    transport=None,
+) -> list[str]:
+    """Run several requests concurrently, at most `concurrency` at a time."""
+    import asyncio
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async with _new_async_http_client(transport) as client:
+        async def _bounded(messages: list[dict]) -> str:
+            async with sem:
+                return await backend.ask_messages_async(messages, client=client)
+
+        return await asyncio.gather(*[_bounded(m) for m in message_lists])
+
+
+def ask_copilot_many(prompts: list[str], concurrency: int = 10, transport=None) -> list[str]:
+    """Answer several prompts concurrently, in the order given.
+
+    Behaves like calling ask_copilot() on each prompt (including the
+    response cache), but the uncached requests run in parallel, which is
+    much faster than one after another for network-bound calls.
+    `transport` is passed to the httpx.AsyncClient used for the batch.
+    """
+    # asyncio is only needed for batches; keep it off the CLI startup path
+    import asyncio
 
+    backend = _select_backend()
+    system = SYSTEM_PROMPT_TLDR if _tldr_mode else SYSTEM_PROMPT
 
-def explain_command(command: str, language: str = "en") -> str:
-    """Explain a shell command using AI."""
-    prompt = f"""Explain this shell command in detail, step by step.
-Command: {command}
+    responses: list[Optional[str]] = [None] * len(prompts)
+    if _cache_enabled:
+        keys = [response_cache.make_key(backend.name, system, p) for p in prompts]
+        responses = [response_cache.get(key) for key in keys]
+    # Identical prompts in the batch are sent once
+    pending = list(dict.fromkeys(p for p, r in zip(prompts, responses) if r is None))
+
+    if pending:
+        message_lists = [
+            [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+            for prompt in pending
+        ]
+        answers = dict(zip(pending, asyncio.run(_ask_many(backend, message_lists, concurrency, transport))))
+        for i, prompt in enumerate(prompts):
+            if responses[i] is None:
+                responses[i] = answers[prompt]
+                if _cache_enabled:
+                    response_cache.set(keys[i], answers[prompt])
+    return responses
+
+
+# Prompt templates, filled in with %-formatting by the explain_* helpers
+
+_COMMAND_PROMPT = """Explain this shell command in detail, step by step.
+Command: %(command)s
 
 Please explain:
 1. What this command does overall
@@ -269,18 +681,11 @@ Please explain:
 3. Common use cases
 4. Any warnings or cautions
 
-Language: Respond in {language}"""
-    
-    return ask_copilot(prompt)
-
+Language: Respond in %(language)s"""
 
-def explain_error(error_message: str, context: Optional[str] = None, language: str = "en") -> str:
-    """Explain an error message and suggest fixes."""
-    context_part = f"\nContext:\n{context}" if context else ""
-    
-    prompt = f"""Explain this error message and suggest how to fix it.
-Error: {error_message}
-{context_part}
+_ERROR_PROMPT = """Explain this error message and suggest how to fix it.
+Error: %(error_message)s
+%(context_part)s
 
 Please provide:
 1. What this error means
@@ -288,19 +693,12 @@ Please provide:
 3. Step-by-step solutions
 4. How to prevent it in the future
 
-Language: Respond in {language}"""
-    
-    return ask_copilot(prompt)
-
+Language: Respond in %(language)s"""
 
-def explain_code(code: str, filename: Optional[str] = None, language: str = "en") -> str:
-    """Explain a piece of code."""
-    file_context = f" (from {filename})" if filename else ""
-    
-    prompt = f"""Explain this code{file_context} in detail.
+_CODE_PROMPT = """Explain this code%(file_context)s in detail.
 
 ```
-{code}
+%(code)s
 ```
 
 Please explain:
@@ -309,19 +707,12 @@ Please explain:
 3. Key concepts and patterns used
 4. Potential improvements or issues
 
-Language: Respond in {language}"""
-    
-    return ask_copilot(prompt)
+Language: Respond in %(language)s"""
 
-
-def explain_diff(diff_text: str, ref: str = "", language: str = "en") -> str:
-    """Explain a git diff."""
-    ref_context = f" (ref: {ref})" if ref else ""
-    
-    prompt = f"""Explain this git diff{ref_context} in detail.
+_DIFF_PROMPT = """Explain this git diff%(ref_context)s in detail.
 
 ```diff
-{diff_text}
+%(diff_text)s
 ```
 
 Please explain:
@@ -330,18 +721,13 @@ Please explain:
 3. Potential impact or risks of these changes
 4. Any suggestions for improvement
 
-Language: Respond in {language}"""
-    
-    return ask_copilot(prompt)
-
+Language: Respond in %(language)s"""
 
-def explain_auto(content: str, content_type: str = "unknown", language: str = "en") -> str:
-    """Auto-detect content type and explain accordingly."""
-    prompt = f"""Analyze and explain the following terminal/code output.
+_AUTO_PROMPT = """Analyze and explain the following terminal/code output.
 First determine what it is (error message, code, command output, log, etc.), then explain it.
 
 ```
-{content}
+%(content)s
 ```
 
 Please provide:
@@ -351,13 +737,103 @@ Please provide:
 4. If it's code: how it works and potential improvements
 5. If it's output: what it means and any notable items
 
-Language: Respond in {language}"""
+Language: Respond in %(language)s"""
+
+
+def explain_command(command: str, language: str = "en", on_chunk: Optional[Callable[[str], None]] = None) -> str:
+    """Explain a shell command using AI."""
+    prompt = _COMMAND_PROMPT % {"command": command, "language": language}
+    
+    return ask_copilot(prompt, on_chunk=on_chunk)
+
+
+def explain_error(
+    error_message: str,
+    context: Optional[str] = None,
+    language: str = "en",
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Explain an error message and suggest fixes."""
+    context_part = f"\nContext:\n{context}" if context else ""
+    
+    prompt = _ERROR_PROMPT % {"error_message": error_message, "context_part": context_part, "language": language}
+    
+    return ask_copilot(prompt, normalized=NORMALIZED_ERROR_CACHE, on_chunk=on_chunk)
+
+
+def explain_code(
+    code: str,
+    filename: Optional[str] = None,
+    language: str = "en",
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Explain a piece of code."""
+    file_context = f" (from {filename})" if filename else ""
+    
+    prompt = _CODE_PROMPT % {"file_context": file_context, "code": code, "language": language}
+    
+    return ask_copilot(prompt, on_chunk=on_chunk)
+
+
+def explain_diff(
+    diff_text: str,
+    ref: str = "",
+    language: str = "en",
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Explain a git diff."""
+    ref_context = f" (ref: {ref})" if ref else ""
     
-    return ask_copilot(prompt)
+    prompt = _DIFF_PROMPT % {"ref_context": ref_context, "diff_text": diff_text, "language": language}
+    
+    return ask_copilot(prompt, on_chunk=on_chunk)
+
+
+def explain_auto(
+    content: str,
+    content_type: str = "unknown",
+    language: str = "en",
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Auto-detect content type and explain accordingly."""
+    prompt = _AUTO_PROMPT % {"content": content, "language": language}
+    
+    return ask_copilot(prompt, on_chunk=on_chunk)
+
+
+# Prompt tokens of earlier conversation sent with each chat message
+DEFAULT_CHAT_CONTEXT_TOKENS = 6000
 
 
-def chat_with_copilot(message: str, history: list[dict] = None, language: str = "en") -> str:
-    """Have a conversation with the AI backend using native messages array."""
+def _chat_context_tokens() -> int:
+    """Read the chat context budget from XPLAIN_CTX_TOKENS, falling back to the default."""
+    value = os.environ.get("XPLAIN_CTX_TOKENS")
+    if value is None:
+        return DEFAULT_CHAT_CONTEXT_TOKENS
+    try:
+        return int(value)
+    except ValueError:
+        print_warning(
+            f"Ignoring invalid XPLAIN_CTX_TOKENS={value!r}; using {DEFAULT_CHAT_CONTEXT_TOKENS}"
+        )
+        return DEFAULT_CHAT_CONTEXT_TOKENS
+
+
+def _approx_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text and code)."""
+    return len(text) // 4 + 1
+
+
+def chat_with_copilot(
+    message: str,
+    history: list[dict] = None,
+    language: str = "en",
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Have a conversation with the AI backend using native messages array.
+
+    With `on_chunk`, the reply is streamed and each piece is passed to it.
+    """
     backend = _select_backend()
 
     messages: list[dict] = [
@@ -372,12 +848,24 @@ def chat_with_copilot(message: str, history: list[dict] = None, language: str =
         }
     ]
 
-    # Add conversation history (last 10 messages for context)
-    if history:
-        for msg in history[-10:]:
-            messages.append({"role": msg["role"], "content": msg["content"]})
+    # The chat loop appends the current message to its history before calling us
+    if history and history[-1] == {"role": "user", "content": message}:
+        history = history[:-1]
+
+    # Add as much recent conversation as fits in the context budget
+    budget = _chat_context_tokens() - _approx_tokens(messages[0]["content"]) - _approx_tokens(message)
+    recent: list[dict] = []
+    for msg in reversed(history or []):
+        budget -= _approx_tokens(msg["content"])
+        if budget < 0:
+            break
+        recent.append({"role": msg["role"], "content": msg["content"]})
+    messages.extend(reversed(recent))
 
     # Add current user message
     messages.append({"role": "user", "content": message})
 
-    return backend.ask_messages(messages)
+    if on_chunk is None:
+        return backend.ask_messages(messages)
+
+    return _collect(backend.ask_messages_stream(messages), on_chunk)
@@ -2,14 +2,11 @@
 
 from rich.console import Console
 from rich.panel import Panel
-from rich.markdown import Markdown
-from rich.syntax import Syntax
 from rich.theme import Theme
 from rich.text import Text
-from rich.live import Live
-from rich.spinner import Spinner
 from typing import Optional
 import json
+import os
 from pathlib import Path
 
 # Custom theme for xplain
@@ -55,9 +52,8 @@ def export_explanation(content: str, filepath: str, title: str = "Explanation"):
     console.print(f"\n[dim]Saved to {filepath}[/]")
 
 
-def print_banner():
-    """Print the xplain banner."""
-    banner = """
+# Built once as Text so printing skips markup parsing and wrapping
+_BANNER = Text("""
 ╔══════════════════════════════════════════════════════════════════╗
 ║                                                                  ║
 ║    ██╗  ██╗██████╗ ██╗      █████╗ ██╗███╗   ██╗                ║
@@ -70,8 +66,12 @@ def print_banner():
 ║         🚀 AI-Powered Code & Command Explainer 🚀               ║
 ║                                                                  ║
 ╚══════════════════════════════════════════════════════════════════╝
-"""
-    console.print(banner, style="bold cyan")
+""", style="bold cyan", no_wrap=True)
+
+
+def print_banner():
+    """Print the xplain banner."""
+    console.print(_BANNER)
 
 
 def print_explanation(
@@ -87,23 +87,31 @@ def print_explanation(
         title: Panel title
         subtitle: Optional subtitle
     """
-    md = Markdown(content)
-    panel = Panel(
-        md,
+    console.print(_explanation_panel(content, title, subtitle))
+
+    # Auto-export if output file is set
+    if _output_file:
+        export_explanation(content, _output_file, title=title)
+
+
+def _explanation_panel(content: str, title: str, subtitle: Optional[str]) -> Panel:
+    """Build the styled markdown panel used for explanations."""
+    # Markdown and Syntax pull in markdown-it and Pygments; import on first use
+    from rich.markdown import Markdown
+
+    return Panel(
+        Markdown(content),
         title=f"[bold cyan]{title}[/]",
         subtitle=f"[dim]{subtitle}[/]" if subtitle else None,
         border_style="cyan",
         padding=(1, 2),
     )
-    console.print(panel)
-
-    # Auto-export if output file is set
-    if _output_file:
-        export_explanation(content, _output_file, title=title)
 
 
 def print_command(command: str):
     """Print a command with syntax highlighting."""
+    from rich.syntax import Syntax
+
     console.print()
     console.print(Panel(
         Syntax(command, "bash", theme="monokai", line_numbers=False),
@@ -115,6 +123,8 @@ def print_command(command: str):
 
 def print_code(code: str, language: str = "python", filename: Optional[str] = None):
     """Print code with syntax highlighting."""
+    from rich.syntax import Syntax
+
     title = f"[bold green]{filename}[/]" if filename else "[bold green]Code[/]"
     console.print()
     console.print(Panel(
@@ -159,6 +169,9 @@ class LoadingSpinner:
         self.live = None
     
     def __enter__(self):
+        from rich.live import Live
+        from rich.spinner import Spinner
+
         spinner = Spinner("dots", text=f"[cyan]{self.message}[/]")
         self.live = Live(spinner, console=console, refresh_per_second=10)
         self.live.__enter__()
@@ -169,6 +182,49 @@ class LoadingSpinner:
             self.live.__exit__(*args)
 
 
+class StreamingExplanation:
+    """Context manager that renders an explanation panel while it streams in.
+
+    Shows a spinner until the first chunk arrives, then the markdown panel,
+    re-rendered at the refresh rate rather than on every chunk. The live view
+    is cropped to the terminal height; on exit it is replaced by the full
+    panel, so no print_explanation() is needed afterwards.
+    """
+
+    def __init__(self, message: str = "Thinking...", title: str = "Explanation", subtitle: Optional[str] = None):
+        self.message = message
+        self.title = title
+        self.subtitle = subtitle
+        self.content = ""
+        self.live = None
+        self._spinner = None
+
+    def _render(self):
+        if not self.content:
+            return self._spinner
+        return _explanation_panel(self.content, self.title, self.subtitle)
+
+    def update(self, chunk: str):
+        """Append a chunk of the response."""
+        self.content += chunk
+
+    def __enter__(self):
+        from rich.live import Live
+        from rich.spinner import Spinner
+
+        # Created once so the animation doesn't restart on every refresh
+        self._spinner = Spinner("dots", text=f"[cyan]{self.message}[/]")
+        self.live = Live(console=console, refresh_per_second=10, transient=True, get_renderable=self._render)
+        self.live.__enter__()
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if self.live:
+            self.live.__exit__(exc_type, *args)
+        if exc_type is None and self.content:
+            print_explanation(self.content, title=self.title, subtitle=self.subtitle)
+
+
 def format_language_flag(lang: str) -> str:
     """Get flag emoji for language code."""
     flags = {
@@ -186,66 +242,64 @@ def format_language_flag(lang: str) -> str:
     return flags.get(lang, "🌐")
 
 
+# Language by file extension (lowercase)
+_EXTENSIONS = {
+    ".py": "python",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".jsx": "jsx",
+    ".tsx": "tsx",
+    ".java": "java",
+    ".c": "c",
+    ".cpp": "cpp",
+    ".h": "c",
+    ".hpp": "cpp",
+    ".cs": "csharp",
+    ".go": "go",
+    ".rs": "rust",
+    ".rb": "ruby",
+    ".php": "php",
+    ".swift": "swift",
+    ".kt": "kotlin",
+    ".scala": "scala",
+    ".sh": "bash",
+    ".bash": "bash",
+    ".zsh": "zsh",
+    ".fish": "fish",
+    ".ps1": "powershell",
+    ".sql": "sql",
+    ".html": "html",
+    ".css": "css",
+    ".scss": "scss",
+    ".sass": "sass",
+    ".less": "less",
+    ".json": "json",
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".xml": "xml",
+    ".md": "markdown",
+    ".r": "r",
+    ".lua": "lua",
+    ".vim": "vim",
+    ".dockerfile": "dockerfile",
+    ".tf": "terraform",
+    ".vue": "vue",
+    ".svelte": "svelte",
+}
+
+# Files recognised by their whole name
+_SPECIAL_FILES = {
+    "Dockerfile": "dockerfile",
+    "Makefile": "makefile",
+    "CMakeLists.txt": "cmake",
+    ".gitignore": "gitignore",
+    ".env": "dotenv",
+}
+
+
 def detect_code_language(filename: str) -> str:
     """Detect programming language from filename."""
-    extensions = {
-        ".py": "python",
-        ".js": "javascript",
-        ".ts": "typescript",
-        ".jsx": "jsx",
-        ".tsx": "tsx",
-        ".java": "java",
-        ".c": "c",
-        ".cpp": "cpp",
-        ".h": "c",
-        ".hpp": "cpp",
-        ".cs": "csharp",
-        ".go": "go",
-        ".rs": "rust",
-        ".rb": "ruby",
-        ".php": "php",
-        ".swift": "swift",
-        ".kt": "kotlin",
-        ".scala": "scala",
-        ".sh": "bash",
-        ".bash": "bash",
-        ".zsh": "zsh",
-        ".fish": "fish",
-        ".ps1": "powershell",
-        ".sql": "sql",
-        ".html": "html",
-        ".css": "css",
-        ".scss": "scss",
-        ".sass": "sass",
-        ".less": "less",
-        ".json": "json",
-        ".yaml": "yaml",
-        ".yml": "yaml",
-        ".xml": "xml",
-        ".md": "markdown",
-        ".r": "r",
-        ".R": "r",
-        ".lua": "lua",
-        ".vim": "vim",
-        ".dockerfile": "dockerfile",
-        ".tf": "terraform",
-        ".vue": "vue",
-        ".svelte": "svelte",
-    }
-    
-    for ext, lang in extensions.items():
-        if filename.lower().endswith(ext):
-            return lang
-    
-    # Check for special filenames
-    special_files = {
-        "Dockerfile": "dockerfile",
-        "Makefile": "makefile",
-        "CMakeLists.txt": "cmake",
-        ".gitignore": "gitignore",
-        ".env": "dotenv",
-    }
-    
-    import os
-    basename = os.path.basename(filename)
-    return special_files.get(basename, "text")
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+    return _SPECIAL_FILES.get(os.path.basename(filename), "text")
@@ -1,11 +1,30 @@
-"""JSON-based history storage for xplain CLI."""
+"""JSON Lines history storage for xplain CLI."""
 
 import json
+import os
+import threading
 import time
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 from dataclasses import dataclass, field, asdict
 
+try:
+    import orjson
+except ImportError:  # optional speedup (pip install xplain[speedups])
+    orjson = None
+
+
+def _dumps_line(obj) -> bytes:
+    """Serialize one history record as a compact UTF-8 JSON line."""
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 
 @dataclass
 class HistoryEntry:
@@ -20,7 +39,6 @@ class HistoryEntry:
     @property
     def time_str(self) -> str:
         """Human-readable timestamp."""
-        from datetime import datetime
         return datetime.fromtimestamp(self.timestamp).strftime("%Y-%m-%d %H:%M:%S")
 
     @property
@@ -31,44 +49,95 @@ class HistoryEntry:
 
 
 class HistoryStore:
-    """Manages explanation history in a JSON file."""
+    """Manages explanation history in an append-only JSON Lines file.
+
+    Each add() appends one line instead of rewriting the whole file. Once
+    the file holds COMPACT_AT lines it is rewritten with only the newest
+    MAX_ENTRIES.
+    """
 
     MAX_ENTRIES = 500
+    COMPACT_AT = MAX_ENTRIES * 3 // 2
 
-    def __init__(self, history_dir: Optional[Path] = None):
+    def __init__(self, history_dir: Optional[Path] = None, background_writes: bool = False):
         if history_dir is None:
             history_dir = Path.home() / ".cache" / "xplain"
-        history_dir.mkdir(parents=True, exist_ok=True)
-        self.history_file = history_dir / "history.json"
+        self.history_file = history_dir / "history.jsonl"
+        # Written by older versions as a single JSON array; migrated on first write
+        self.legacy_file = history_dir / "history.json"
         self._entries: Optional[list[HistoryEntry]] = None
+        # Lines in history_file, counted on the first append
+        self._line_count: Optional[int] = None
+        # With background writes, add() returns before the file is written.
+        # The writer thread is non-daemon, so the interpreter still waits for
+        # it on exit and no entry is lost.
+        self.background_writes = background_writes
+        self._writer: Optional[threading.Thread] = None
 
     def _load(self) -> list[HistoryEntry]:
         """Load history from disk."""
         if self._entries is not None:
             return self._entries
 
-        if not self.history_file.exists():
-            self._entries = []
-            return self._entries
-
-        try:
-            data = json.loads(self.history_file.read_text())
-            self._entries = [HistoryEntry(**entry) for entry in data]
-        except (json.JSONDecodeError, TypeError, KeyError):
-            self._entries = []
-
+        entries = []
+        if self.history_file.exists():
+            with self.history_file.open("rb") as f:
+                for line in f:
+                    try:
+                        entries.append(HistoryEntry(**_loads(line)))
+                    except (json.JSONDecodeError, TypeError, KeyError):
+                        # Skip a line cut short by an interrupted write
+                        continue
+        elif self.legacy_file.exists():
+            try:
+                data = _loads(self.legacy_file.read_bytes())
+                entries = [HistoryEntry(**entry) for entry in data]
+            except (json.JSONDecodeError, TypeError, KeyError):
+                entries = []
+
+        self._entries = entries[-self.MAX_ENTRIES:]
         return self._entries
 
-    def _save(self):
-        """Save history to disk."""
-        entries = self._load()
-        # Trim to max entries
-        if len(entries) > self.MAX_ENTRIES:
-            entries = entries[-self.MAX_ENTRIES:]
-            self._entries = entries
-
-        data = [asdict(e) for e in entries]
-        self.history_file.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+    def _write_all(self, entries: list[HistoryEntry]):
+        """Rewrite the history file with `entries` (atomically)."""
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.history_file.with_suffix(".jsonl.tmp")
+        with tmp.open("wb") as f:
+            f.write(b"".join(_dumps_line(asdict(entry)) for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.history_file)
+        self._line_count = len(entries)
+
+    def _append(self, entry: HistoryEntry):
+        """Append one entry to disk, compacting the file when it grows too long."""
+        # The in-memory list may or may not already hold `entry`
+        def earlier_entries():
+            return [e for e in self._load() if e is not entry]
+
+        if not self.history_file.exists() and self.legacy_file.exists():
+            self._write_all(earlier_entries())
+            self.legacy_file.unlink()
+            # Re-read on next use so the list picks up `entry` from disk
+            self._entries = None
+
+        if self._line_count is None:
+            try:
+                with self.history_file.open("rb") as f:
+                    self._line_count = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 16), b""))
+            except FileNotFoundError:
+                self._line_count = 0
+
+        if self._line_count + 1 >= self.COMPACT_AT:
+            self._entries = (earlier_entries() + [entry])[-self.MAX_ENTRIES:]
+            self._write_all(self._entries)
+            return
+
+        # Created on first write rather than whenever the store is constructed
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        with self.history_file.open("ab") as f:
+            f.write(_dumps_line(asdict(entry)))
+        self._line_count += 1
 
     def add(
         self,
@@ -79,16 +148,30 @@ class HistoryStore:
         metadata: Optional[dict] = None,
     ):
         """Add a new history entry."""
-        entries = self._load()
-        entries.append(HistoryEntry(
+        # The previous write may still be appending; let it finish first
+        self.flush()
+        entry = HistoryEntry(
             timestamp=time.time(),
             command_type=command_type,
             query=query,
             explanation=explanation,
             language=language,
             metadata=metadata or {},
-        ))
-        self._save()
+        )
+        if self._entries is not None:
+            self._entries.append(entry)
+            del self._entries[:-self.MAX_ENTRIES]
+        if self.background_writes:
+            self._writer = threading.Thread(target=self._append, args=(entry,), name="xplain-history")
+            self._writer.start()
+        else:
+            self._append(entry)
+
+    def flush(self):
+        """Wait for a pending background write to finish."""
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
 
     def list_entries(
         self,
@@ -120,13 +203,15 @@ class HistoryStore:
 
     def clear(self):
         """Clear all history."""
+        self.flush()
         self._entries = []
-        self._save()
+        self._write_all([])
+        self.legacy_file.unlink(missing_ok=True)
 
     def count(self) -> int:
         """Get total number of entries."""
         return len(self._load())
 
 
-# Global instance
-history = HistoryStore()
+# Global instance; commands return to the shell (or the chat prompt) without waiting on disk
+history = HistoryStore(background_writes=True)
@@ -0,0 +1,106 @@
+"""Run subprocesses with a cap on how much output is kept."""
+
+import os
+import signal
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import Union
+
+
+@dataclass
+class BoundedOutput:
+    """Result of run_bounded()."""
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+    truncated: bool = False  # a stream went over the cap
+    timed_out: bool = False
+
+
+def _kill(proc: subprocess.Popen):
+    """Kill the process and, on POSIX, everything it spawned (e.g. a shell pipeline)."""
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+def run_bounded(
+    cmd: Union[str, list[str]],
+    max_bytes: int,
+    timeout: float,
+    shell: bool = False,
+    kill_on_overflow: bool = True,
+) -> BoundedOutput:
+    """
+    Run a command, keeping at most `max_bytes` of stdout and of stderr.
+
+    Both pipes are drained concurrently, so neither can fill up and stall
+    the child. By default the process is killed as soon as either stream
+    exceeds the cap, so runaway output never accumulates in memory. With
+    `kill_on_overflow=False` it runs to completion instead: output past
+    the cap is read and thrown away, stdout keeps its first `max_bytes`
+    and stderr its last (where errors usually are), and the real exit
+    code is returned. Either way the process is killed once `timeout`
+    expires.
+    """
+    # Own process group, so killing it also stops children still holding the pipes
+    proc = subprocess.Popen(
+        cmd,
+        shell=shell,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=os.name == "posix",
+    )
+    output: dict[str, bytes] = {}
+    over_cap = threading.Event()
+
+    def _read(name: str, pipe):
+        output[name] = pipe.read(max_bytes)
+        if pipe.read(1):
+            over_cap.set()
+            _kill(proc)
+
+    def _drain(name: str, pipe, keep_tail: bool):
+        kept = bytearray(pipe.read(max_bytes))
+        output[name] = bytes(kept)
+        for chunk in iter(lambda: pipe.read(65536), b""):
+            over_cap.set()
+            if keep_tail:
+                kept += chunk
+                del kept[:-max_bytes]
+                output[name] = bytes(kept)
+
+    if kill_on_overflow:
+        targets = [(_read, ("stdout", proc.stdout)), (_read, ("stderr", proc.stderr))]
+    else:
+        targets = [(_drain, ("stdout", proc.stdout, False)), (_drain, ("stderr", proc.stderr, True))]
+    readers = [threading.Thread(target=target, args=args, daemon=True) for target, args in targets]
+    for reader in readers:
+        reader.start()
+
+    try:
+        proc.wait(timeout=timeout)
+        timed_out = False
+    except subprocess.TimeoutExpired:
+        _kill(proc)
+        proc.wait()
+        timed_out = True
+
+    # The pipes hit EOF once the process is gone. A child that escaped the
+    # process group could still hold them open, so don't wait forever.
+    for reader in readers:
+        reader.join(timeout=1)
+
+    return BoundedOutput(
+        returncode=proc.returncode,
+        stdout=output.get("stdout", b""),
+        stderr=output.get("stderr", b""),
+        truncated=over_cap.is_set(),
+        # A process killed for its output isn't reported as timed out too
+        timed_out=timed_out and not (kill_on_overflow and over_cap.is_set()),
+    )
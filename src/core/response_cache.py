@@ -0,0 +1,116 @@
+"""Disk cache for AI responses."""
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from ..config import config
+
+# Directory part of absolute paths ("/home/me/app/" in "/home/me/app/main.py")
+_PATH_DIR_RE = re.compile(r"""(?:[A-Za-z]:)?(?:[/\\][^\s/\\:"']+)+[/\\]""")
+# Hex addresses ("object at 0x7f3a2b")
+_ADDRESS_RE = re.compile(r"\b0x[0-9a-fA-F]+\b")
+# Source positions: "line 10", "column 5", "app.ts:10:5"
+_POSITION_RE = re.compile(r"\b(line|col|column) \d+|:\d+:\d+\b", re.IGNORECASE)
+
+
+def normalize_error(text: str) -> str:
+    """Reduce an error to its shape so reruns that only differ in location match.
+
+    Absolute paths keep their file name, hex addresses and line/column
+    numbers become "N" and whitespace is collapsed. Other numbers (status,
+    exit and errno values, error codes like TS2322) are kept, since they
+    change what the error means.
+    """
+    text = _PATH_DIR_RE.sub("", text)
+    text = _ADDRESS_RE.sub("N", text)
+    text = _POSITION_RE.sub(lambda m: f"{m.group(1)} N" if m.group(1) else ":N:N", text)
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    """Caches responses on disk, keyed by a hash of model, system prompt and prompt.
+
+    Recently used entries are also kept in memory, so a prompt asked again
+    in the same process (e.g. by a script calling ask_copilot or
+    ask_copilot_many repeatedly) skips the disk. Chat does not use the cache.
+    """
+
+    # Cached explanations expire after a week
+    TTL = 7 * 24 * 3600
+
+    # Entries kept in memory (least recently used are dropped first)
+    MEMORY_ENTRIES = 256
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        # Resolved on first use, so importing doesn't create config.cache_dir
+        self._cache_dir = cache_dir
+        # key -> (stored_at, response)
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # Expired files are swept once per process, on the first write
+        self._pruned = False
+
+    @property
+    def cache_dir(self) -> Path:
+        if self._cache_dir is None:
+            self._cache_dir = config.cache_dir / "responses"
+        return self._cache_dir
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str) -> str:
+        """Build the cache key for a request."""
+        payload = "\0".join((model, system_prompt, prompt)).encode()
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None if missing or expired."""
+        entry = self._memory.get(key)
+        if entry is not None and time.time() - entry[0] <= self.TTL:
+            self._memory.move_to_end(key)
+            return entry[1]
+
+        path = self.cache_dir / f"{key}.txt"
+        try:
+            stored_at = path.stat().st_mtime
+            if time.time() - stored_at > self.TTL:
+                return None
+            response = path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+        self._remember(key, response, stored_at)
+        return response
+
+    def set(self, key: str, response: str):
+        """Store a response."""
+        self._remember(key, response, time.time())
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / f"{key}.txt").write_text(response, encoding="utf-8")
+        except OSError:
+            pass
+        if not self._pruned:
+            self._pruned = True
+            self._prune()
+
+    def _prune(self):
+        """Delete cached files older than the TTL."""
+        cutoff = time.time() - self.TTL
+        for path in self.cache_dir.glob("*.txt"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def _remember(self, key: str, response: str, stored_at: float):
+        self._memory[key] = (stored_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+
+# Global instance
+response_cache = ResponseCache()
@@ -0,0 +1,114 @@
+"""Shared fixtures for xplain tests."""
+
+import functools
+import os
+import re
+import shutil
+import tempfile
+
+import pytest
+from typer.testing import CliRunner
+
+from src.cli import app
+from src.core.history_store import HistoryStore
+
+runner = CliRunner()
+
+# Command names, flags and other words in help output
+_WORD_RE = re.compile(r"[\w-]+")
+
+# RAM-backed filesystem for the history, cache and export test files (Linux)
+SHM_DIR = "/dev/shm"
+
+
+def pytest_configure(config):
+    """With XPLAIN_TEST_TMPFS=1, put tmp_path directories in a fresh directory on tmpfs.
+
+    Each run gets its own directory (removed afterwards), so concurrent runs
+    never delete each other's files. An explicit --basetemp always wins.
+    """
+    if os.environ.get("XPLAIN_TEST_TMPFS") != "1" or config.option.basetemp:
+        return
+    if not os.access(SHM_DIR, os.W_OK):
+        return
+    config._xplain_tmpfs = tempfile.mkdtemp(prefix="pytest-xplain-", dir=SHM_DIR)
+    config.option.basetemp = config._xplain_tmpfs
+
+
+def pytest_unconfigure(config):
+    """Remove the tmpfs directory created for this run."""
+    path = getattr(config, "_xplain_tmpfs", None)
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _invoke(*args: str) -> str:
+    """Run the CLI and return its output, failing on a non-zero exit.
+
+    Only for read-only invocations: the output is reused for identical
+    arguments.
+    """
+    result = runner.invoke(app, list(args))
+    assert result.exit_code == 0, result.output
+    return result.stdout
+
+
+@pytest.fixture(scope="session")
+def invoke():
+    """Run a read-only CLI invocation, once per distinct argv."""
+    return _invoke
+
+
+@pytest.fixture(scope="session")
+def help_output() -> str:
+    """Output of `xplain --help`."""
+    return _invoke("--help")
+
+
+@pytest.fixture(scope="session")
+def help_words(help_output) -> set[str]:
+    """Command names, flags and other words in `xplain --help`."""
+    return set(_WORD_RE.findall(help_output))
+
+
+@pytest.fixture(scope="session")
+def models_output() -> str:
+    """Output of `xplain models`."""
+    return _invoke("models")
+
+
+@pytest.fixture(scope="session")
+def wtf_help_output() -> str:
+    """Output of `xplain wtf --help`."""
+    return _invoke("wtf", "--help")
+
+
+@pytest.fixture(scope="session")
+def wtf_help_words(wtf_help_output) -> set[str]:
+    """Flags and other words in `xplain wtf --help`."""
+    return set(_WORD_RE.findall(wtf_help_output))
+
+
+@pytest.fixture
+def histfile(tmp_path, monkeypatch):
+    """Factory that writes a shell history file and points $HISTFILE at it."""
+    def _make(name: str, content: str):
+        path = tmp_path / name
+        path.write_text(content)
+        monkeypatch.setenv("HISTFILE", str(path))
+        return path
+    return _make
+
+
+@pytest.fixture(scope="class")
+def shared_store(tmp_path_factory):
+    """One HistoryStore per test class."""
+    return HistoryStore(history_dir=tmp_path_factory.mktemp("history"))
+
+
+@pytest.fixture
+def store(shared_store):
+    """The class's HistoryStore, emptied before each test."""
+    shared_store.clear()
+    return shared_store
@@ -1,464 +1,214 @@
 """Tests for xplain CLI."""
 
-import json
-import tempfile
+import re
+import subprocess
+import sys
 from pathlib import Path
+
+import pytest
 from typer.testing import CliRunner
-from src.cli import app
-from src.config import LANGUAGE_NAMES, config
 
-runner = CliRunner()
+from src.cli import app
+from src.commands import wtf
+import src.commands.chat as chat_module
+from src.config import LANGUAGE_NAMES
+from src.core import copilot
 
 
 class TestCLI:
     """Test CLI commands."""
 
-    def test_version(self):
+    def test_version(self, invoke):
         """Test version command."""
-        result = runner.invoke(app, ["version"])
-        assert result.exit_code == 0
-        assert "xplain" in result.stdout
+        assert "xplain" in invoke("version")
 
-    def test_langs(self):
+    def test_langs(self, invoke):
         """Test langs command."""
-        result = runner.invoke(app, ["langs"])
-        assert result.exit_code == 0
-        for lang_code in LANGUAGE_NAMES:
-            assert lang_code in result.stdout
+        listed = set(re.findall(r"(\w+):", invoke("langs")))
+        missing = set(LANGUAGE_NAMES) - listed
+        assert not missing, missing
 
-    def test_config_show(self):
+    def test_config_show(self, invoke):
         """Test config --show command."""
-        result = runner.invoke(app, ["config"])
-        assert result.exit_code == 0
-        assert "Configuration" in result.stdout
+        assert "Configuration" in invoke("config")
 
-    def test_help(self):
+    def test_help(self, help_words):
         """Test help output."""
-        result = runner.invoke(app, ["--help"])
-        assert result.exit_code == 0
-        assert "cmd" in result.stdout
-        assert "error" in result.stdout
-        assert "code" in result.stdout
-        assert "chat" in result.stdout
-        assert "pipe" in result.stdout
-        assert "diff" in result.stdout
-        assert "history" in result.stdout
-
-
-class TestConfig:
-    """Test configuration."""
-
-    def test_default_language(self):
-        """Test default language is set."""
-        assert config.language in LANGUAGE_NAMES
-
-    def test_language_names(self):
-        """Test all language codes have names."""
-        assert len(LANGUAGE_NAMES) >= 10
-        for code, name in LANGUAGE_NAMES.items():
-            assert len(code) == 2
-            assert len(name) > 0
-
-
-class TestFormatter:
-    """Test formatter utilities."""
-
-    def test_detect_code_language(self):
-        """Test programming language detection."""
-        from src.core.formatter import detect_code_language
-
-        assert detect_code_language("test.py") == "python"
-        assert detect_code_language("app.js") == "javascript"
-        assert detect_code_language("main.go") == "go"
-        assert detect_code_language("Dockerfile") == "dockerfile"
-        assert detect_code_language("unknown.xyz") == "text"
-
-    def test_format_language_flag(self):
-        """Test language flag formatting."""
-        from src.core.formatter import format_language_flag
-
-        assert format_language_flag("en") == "🇺🇸"
-        assert format_language_flag("vi") == "🇻🇳"
-        assert format_language_flag("unknown") == "🌐"
-
-
-class TestHistoryStore:
-    """Test history storage."""
-
-    def test_add_and_list(self):
-        """Test adding and listing history entries."""
-        from src.core.history_store import HistoryStore
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            store = HistoryStore(history_dir=Path(tmpdir))
-            store.add("cmd", "ls -la", "Lists files in detail", language="en")
-            store.add("error", "TypeError", "Type mismatch", language="vi")
-
-            entries = store.list_entries()
-            assert len(entries) == 2
-            assert entries[0].command_type == "cmd"
-            assert entries[1].command_type == "error"
-
-    def test_search(self):
-        """Test searching history."""
-        from src.core.history_store import HistoryStore
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            store = HistoryStore(history_dir=Path(tmpdir))
-            store.add("cmd", "docker run nginx", "Runs nginx container")
-            store.add("cmd", "git push origin main", "Pushes to main")
-            store.add("error", "docker: command not found", "Docker not installed")
-
-            results = store.search("docker")
-            assert len(results) == 2
-
-    def test_clear(self):
-        """Test clearing history."""
-        from src.core.history_store import HistoryStore
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            store = HistoryStore(history_dir=Path(tmpdir))
-            store.add("cmd", "test", "test explanation")
-            assert store.count() == 1
-            store.clear()
-            assert store.count() == 0
-
-    def test_get_by_index(self):
-        """Test getting entry by index (1-based from recent)."""
-        from src.core.history_store import HistoryStore
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            store = HistoryStore(history_dir=Path(tmpdir))
-            store.add("cmd", "first", "first explanation")
-            store.add("cmd", "second", "second explanation")
-            store.add("cmd", "third", "third explanation")
-
-            # Index 1 = most recent
-            entry = store.get(1)
-            assert entry.query == "third"
-
-            entry = store.get(3)
-            assert entry.query == "first"
-
-            assert store.get(0) is None
-            assert store.get(4) is None
-
-
-class TestPipeDetection:
-    """Test pipe content type detection."""
-
-    def test_detect_error(self):
-        """Test error detection in piped content."""
-        from src.commands.pipe import _detect_content_type
-
-        content = """Traceback (most recent call last):
-  File "app.py", line 10, in <module>
-    result = process(data)
-TypeError: 'NoneType' object is not subscriptable"""
-        assert _detect_content_type(content) == "error"
-
-    def test_detect_code(self):
-        """Test code detection in piped content."""
-        from src.commands.pipe import _detect_content_type
-
-        content = """import os
-from pathlib import Path
-
-def process_files(directory):
-    for f in Path(directory).glob('*.py'):
-        print(f.name)
-"""
-        assert _detect_content_type(content) == "code"
-
-    def test_detect_auto(self):
-        """Test auto detection for general output."""
-        from src.commands.pipe import _detect_content_type
-
-        content = """total 48
-drwxr-xr-x  12 user  staff   384 Feb 10 10:00 .
-drwxr-xr-x   5 user  staff   160 Feb  9 09:00 ..
--rw-r--r--   1 user  staff  1234 Feb 10 10:00 README.md"""
-        assert _detect_content_type(content) == "auto"
-
-    def test_detect_empty(self):
-        """Test empty content detection."""
-        from src.commands.pipe import _detect_content_type
-
-        assert _detect_content_type("") == "unknown"
-
-
-class TestBackends:
-    """Test AI backend selection."""
-
-    def test_backend_classes_exist(self):
-        """Test that backend classes are importable."""
-        from src.core.copilot import GhModelsBackend, HttpxModelsBackend, AIBackend
-
-        assert issubclass(GhModelsBackend, AIBackend)
-        assert issubclass(HttpxModelsBackend, AIBackend)
-
-    def test_gh_models_backend_name(self):
-        """Test GhModelsBackend name."""
-        from src.core.copilot import GhModelsBackend
-
-        backend = GhModelsBackend()
-        assert "GitHub Models" in backend.name
-
-    def test_httpx_models_backend_name(self):
-        """Test HttpxModelsBackend name."""
-        from src.core.copilot import HttpxModelsBackend
-
-        backend = HttpxModelsBackend()
-        assert "GitHub Models" in backend.name
-
-    def test_consolidated_backend(self):
-        """Test that GhModelsBackend and HttpxModelsBackend are the same class."""
-        from src.core.copilot import GhModelsBackend, HttpxModelsBackend, GitHubModelsBackend
-
-        assert GhModelsBackend is GitHubModelsBackend
-        assert HttpxModelsBackend is GitHubModelsBackend
-
-    def test_ask_messages_method_exists(self):
-        """Test that ask_messages method exists on backend."""
-        from src.core.copilot import GitHubModelsBackend
-
-        backend = GitHubModelsBackend()
-        assert hasattr(backend, "ask_messages")
-        assert callable(backend.ask_messages)
-
-
-class TestExport:
-    """Test output export functionality."""
-
-    def test_export_markdown(self):
-        """Test exporting to markdown file."""
-        from src.core.formatter import export_explanation
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            filepath = str(Path(tmpdir) / "test.md")
-            export_explanation("Hello **world**", filepath, title="Test")
-            content = Path(filepath).read_text()
-            assert "# Test" in content
-            assert "Hello **world**" in content
-
-    def test_export_json(self):
-        """Test exporting to JSON file."""
-        from src.core.formatter import export_explanation
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            filepath = str(Path(tmpdir) / "test.json")
-            export_explanation("Hello world", filepath, title="Test")
-            data = json.loads(Path(filepath).read_text())
-            assert data["title"] == "Test"
-            assert data["content"] == "Hello world"
-
-    def test_export_text(self):
-        """Test exporting to plain text file."""
-        from src.core.formatter import export_explanation
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            filepath = str(Path(tmpdir) / "test.txt")
-            export_explanation("Hello world", filepath, title="Test")
-            content = Path(filepath).read_text()
-            assert content.strip() == "Hello world"
-
-    def test_set_output_file(self):
-        """Test set_output_file sets the global."""
-        from src.core.formatter import set_output_file
-        import src.core.formatter as fmt
-
-        set_output_file("/tmp/test.md")
-        assert fmt._output_file == "/tmp/test.md"
-        set_output_file(None)
-        assert fmt._output_file is None
+        missing = {"cmd", "error", "code", "chat", "pipe", "diff", "history"} - help_words
+        assert not missing, missing
+
+    def test_no_cache_flag_disables_cache(self, monkeypatch):
+        """Test --no-cache turns the response cache off for the command."""
+        monkeypatch.setattr(copilot, "_cache_enabled", True)
+        result = CliRunner().invoke(app, ["--no-cache", "version"])
+        assert result.exit_code == 0, result.output
+        assert copilot._cache_enabled is False
+
+    def test_subcommands_imported_lazily(self):
+        """Test importing the CLI does not import subcommand modules."""
+        code = (
+            "import sys, src.cli; "
+            "print(any(m.startswith('src.commands.') for m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, cwd=Path(__file__).parent.parent,
+        )
+        assert result.stdout.strip() == "False"
+
+    def test_heavy_modules_imported_lazily(self):
+        """Test importing the CLI leaves network, asyncio and live-display modules unloaded."""
+        code = (
+            "import sys, src.cli; "
+            "print(sorted(m for m in ('httpx', 'asyncio', 'rich.live', 'rich.spinner') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, cwd=Path(__file__).parent.parent,
+        )
+        assert result.stdout.strip() == "[]"
 
 
 class TestCLIGlobalOptions:
     """Test global CLI options."""
 
-    def test_help_shows_output_flag(self):
-        """Test that --output flag appears in help."""
-        result = runner.invoke(app, ["--help"])
-        assert "--output" in result.stdout
-
-    def test_help_shows_no_color_flag(self):
-        """Test that --no-color flag appears in help."""
-        result = runner.invoke(app, ["--help"])
-        assert "--no-color" in result.stdout
-
-    def test_help_shows_model_flag(self):
-        """Test that --model flag appears in help."""
-        result = runner.invoke(app, ["--help"])
-        assert "--model" in result.stdout
+    @pytest.mark.parametrize("flag", ["--output", "--no-color", "--model", "--no-cache"])
+    def test_help_shows_flag(self, help_words, flag):
+        """Test global flags appear in help."""
+        assert flag in help_words
 
 
 class TestModelSelection:
     """Test AI model selection."""
 
-    def test_models_command(self):
+    def test_models_command(self, models_output):
         """Test models command lists available models."""
-        result = runner.invoke(app, ["models"])
-        assert result.exit_code == 0
-        assert "openai/gpt-4o-mini" in result.stdout
-        assert "openai/gpt-4.1" in result.stdout
-
-    def test_available_models_dict(self):
-        """Test AVAILABLE_MODELS has entries."""
-        from src.config import AVAILABLE_MODELS, DEFAULT_MODEL
-
-        assert len(AVAILABLE_MODELS) >= 5
-        assert DEFAULT_MODEL in AVAILABLE_MODELS
-
-    def test_config_has_model(self):
-        """Test config has model attribute."""
-        assert hasattr(config, "model")
-        assert config.model == "openai/gpt-4o-mini"  # default
-
-    def test_set_model(self):
-        """Test set_model changes the selected model."""
-        from src.core.copilot import set_model
-        import src.core.copilot as copilot_mod
-
-        set_model("openai/gpt-4.1")
-        assert copilot_mod._selected_model == "openai/gpt-4.1"
-        # Reset
-        set_model(None)
-        copilot_mod._selected_model = None
-
-    def test_backend_uses_model(self):
-        """Test GitHubModelsBackend accepts model parameter."""
-        from src.core.copilot import GitHubModelsBackend
-
-        backend = GitHubModelsBackend(model="openai/gpt-4.1")
-        assert backend.model == "openai/gpt-4.1"
-        assert "gpt-4.1" in backend.name
+        assert "openai/gpt-4o-mini" in models_output
+        assert "openai/gpt-4.1" in models_output
 
 
 class TestWTFCommand:
     """Test WTF command utilities."""
 
-    def test_wtf_help(self):
+    def test_wtf_help(self, wtf_help_output):
         """Test wtf command appears in help."""
-        result = runner.invoke(app, ["wtf", "--help"])
-        assert result.exit_code == 0
-        assert "last failed command" in result.stdout.lower() or "shell history" in result.stdout.lower()
+        assert "last failed command" in wtf_help_output.lower() or "shell history" in wtf_help_output.lower()
 
-    def test_wtf_registered(self):
+    def test_wtf_registered(self, help_words):
         """Test wtf command is registered."""
-        result = runner.invoke(app, ["--help"])
-        assert "wtf" in result.stdout
-
-    def test_get_last_command_zsh(self):
-        """Test zsh history parsing."""
-        from src.commands.wtf import _get_last_command_zsh
-        import tempfile
-        import os
-
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".zsh_history", delete=False) as f:
-            f.write(": 1707600000:0;echo hello\n")
-            f.write(": 1707600001:0;git push origin main\n")
-            tmppath = f.name
-
-        old_histfile = os.environ.get("HISTFILE")
-        try:
-            os.environ["HISTFILE"] = tmppath
-            cmd = _get_last_command_zsh()
-            assert cmd == "git push origin main"
-        finally:
-            if old_histfile:
-                os.environ["HISTFILE"] = old_histfile
-            elif "HISTFILE" in os.environ:
-                del os.environ["HISTFILE"]
-            os.unlink(tmppath)
-
-    def test_get_last_command_bash(self):
-        """Test bash history parsing."""
-        from src.commands.wtf import _get_last_command_bash
-        import tempfile
-        import os
-
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".bash_history", delete=False) as f:
-            f.write("echo hello\n")
-            f.write("npm run build\n")
-            tmppath = f.name
-
-        old_histfile = os.environ.get("HISTFILE")
-        try:
-            os.environ["HISTFILE"] = tmppath
-            cmd = _get_last_command_bash()
-            assert cmd == "npm run build"
-        finally:
-            if old_histfile:
-                os.environ["HISTFILE"] = old_histfile
-            elif "HISTFILE" in os.environ:
-                del os.environ["HISTFILE"]
-            os.unlink(tmppath)
-
-    def test_format_as_json(self):
-        """Test JSON output formatter."""
-        import json
-        from src.commands.wtf import _format_as_json
-
-        result = _format_as_json("It failed because...", "git push", 1, "en")
-        data = json.loads(result)
-        assert data["type"] == "wtf_explanation"
-        assert data["command"] == "git push"
-        assert data["exit_code"] == 1
-        assert data["language"] == "en"
-        assert data["explanation"] == "It failed because..."
-
-    def test_wtf_json_flag_in_help(self):
+        assert "wtf" in help_words
+
+    def test_wtf_json_flag_in_help(self, wtf_help_words):
         """Test --json flag appears in wtf help."""
-        result = runner.invoke(app, ["wtf", "--help"])
-        assert "--json" in result.stdout
+        assert "--json" in wtf_help_words
+
+    def test_wtf_rerun_flag_in_help(self, wtf_help_words):
+        """Test --rerun/--no-rerun flag appears in wtf help."""
+        missing = {"--rerun", "--no-rerun"} - wtf_help_words
+        assert not missing, missing
+
+    @pytest.fixture
+    def wtf_calls(self, monkeypatch):
+        """Stub history, re-running and the AI call; record re-runs and prompts."""
+        calls = {"reruns": [], "prompts": []}
+
+        def fake_rerun(command):
+            calls["reruns"].append(command)
+            return 1, "", "boom"
+
+        def fake_llm(kind, query, lang, fn, *args, **kwargs):
+            calls["prompts"].append(args[-1])
+            return "explanation"
+
+        monkeypatch.setattr(wtf, "_get_last_command", lambda: "make build")
+        monkeypatch.setattr(wtf, "_rerun_command", fake_rerun)
+        monkeypatch.setattr(wtf, "run_llm", fake_llm)
+        monkeypatch.delenv("XPLAIN_LAST_STDERR", raising=False)
+        return calls
+
+    def test_captured_stderr_skips_rerun(self, wtf_calls, monkeypatch, tmp_path):
+        """Test a recorded exit code plus captured stderr is explained without re-running."""
+        stderr_file = tmp_path / "stderr"
+        stderr_file.write_text("make: *** No rule to make target 'build'.\n")
+        monkeypatch.setenv("XPLAIN_LAST_EXIT", "2")
+        monkeypatch.setenv("XPLAIN_LAST_STDERR", str(stderr_file))
+        result = CliRunner().invoke(app, ["wtf"])
+        assert result.exit_code == 0, result.output
+        assert wtf_calls["reruns"] == []
+        assert "Exit code 2" in result.stdout
+        assert "No rule to make target" in wtf_calls["prompts"][0]
+
+    def test_exit_code_alone_reruns(self, wtf_calls, monkeypatch):
+        """Test a recorded exit code without captured output still re-runs for the error text."""
+        monkeypatch.setenv("XPLAIN_LAST_EXIT", "2")
+        result = CliRunner().invoke(app, ["wtf"])
+        assert result.exit_code == 0, result.output
+        assert wtf_calls["reruns"] == ["make build"]
+        assert "boom" in wtf_calls["prompts"][0]
+
+    def test_missing_exit_code_reruns(self, wtf_calls, monkeypatch):
+        """Test the command is re-run when the shell hook recorded nothing."""
+        monkeypatch.delenv("XPLAIN_LAST_EXIT", raising=False)
+        result = CliRunner().invoke(app, ["wtf"])
+        assert result.exit_code == 0, result.output
+        assert wtf_calls["reruns"] == ["make build"]
+
+    def test_no_rerun_without_output_warns(self, wtf_calls, monkeypatch):
+        """Test --no-rerun with only an exit code warns that no output was captured."""
+        monkeypatch.setenv("XPLAIN_LAST_EXIT", "2")
+        result = CliRunner().invoke(app, ["wtf", "--no-rerun"])
+        assert result.exit_code == 0, result.output
+        assert wtf_calls["reruns"] == []
+        assert "--rerun" in result.output
+
+    def test_rerun_flag_forces_rerun(self, wtf_calls, monkeypatch, tmp_path):
+        """Test --rerun re-runs the command even with captured output."""
+        stderr_file = tmp_path / "stderr"
+        stderr_file.write_text("old error\n")
+        monkeypatch.setenv("XPLAIN_LAST_EXIT", "2")
+        monkeypatch.setenv("XPLAIN_LAST_STDERR", str(stderr_file))
+        result = CliRunner().invoke(app, ["wtf", "--rerun"])
+        assert result.exit_code == 0, result.output
+        assert wtf_calls["reruns"] == ["make build"]
+
+class TestChatCommand:
+    """Test chat mode with piped input."""
+
+    @pytest.fixture
+    def piped_chat(self, monkeypatch):
+        """Stub the AI call and persistent history; fail if prompt_toolkit is used."""
+        sent = []
+
+        def fake_chat(message, history, language, on_chunk=None):
+            sent.append(message)
+            return "reply"
+
+        def no_session():
+            raise AssertionError("prompt_toolkit session created without a terminal")
+
+        monkeypatch.setattr(chat_module, "_create_prompt_session", no_session)
+        monkeypatch.setattr(chat_module, "chat_with_copilot", fake_chat)
+        monkeypatch.setattr(chat_module.history_store, "add", lambda *args, **kwargs: None)
+        return sent
+
+    def test_piped_quit(self, piped_chat):
+        """Test `printf '/q\\n' | xplain chat` exits cleanly."""
+        result = CliRunner().invoke(app, ["chat"], input="/q\n")
+        assert result.exit_code == 0, result.output
+        assert "Goodbye" in result.output
+        assert piped_chat == []
+
+    def test_piped_messages_until_eof(self, piped_chat):
+        """Test piped messages are sent in order and end of input exits."""
+        result = CliRunner().invoke(app, ["chat"], input="first\n\nsecond\n")
+        assert result.exit_code == 0, result.output
+        assert piped_chat == ["first", "second"]
+        assert "Goodbye" in result.output
 
 
 class TestTLDRMode:
     """Test TL;DR mode."""
 
-    def test_tldr_flag_in_help(self):
+    def test_tldr_flag_in_help(self, help_words):
         """Test --tldr flag appears in help."""
-        result = runner.invoke(app, ["--help"])
-        assert "--tldr" in result.stdout
-
-    def test_set_tldr_mode(self):
-        """Test set_tldr_mode toggles the flag."""
-        from src.core.copilot import set_tldr_mode, is_tldr_mode
-        import src.core.copilot as copilot_mod
-
-        set_tldr_mode(True)
-        assert is_tldr_mode() is True
-        assert copilot_mod._tldr_mode is True
-
-        set_tldr_mode(False)
-        assert is_tldr_mode() is False
-        assert copilot_mod._tldr_mode is False
-
-    def test_tldr_system_prompt_exists(self):
-        """Test SYSTEM_PROMPT_TLDR is defined and different from SYSTEM_PROMPT."""
-        from src.core.copilot import SYSTEM_PROMPT, SYSTEM_PROMPT_TLDR
-
-        assert SYSTEM_PROMPT_TLDR != SYSTEM_PROMPT
-        assert "single" in SYSTEM_PROMPT_TLDR.lower() or "one" in SYSTEM_PROMPT_TLDR.lower()
-
-
-class TestShellIntegration:
-    """Test shell integration files exist and are valid."""
-
-    def test_zsh_integration_exists(self):
-        """Test zsh integration file exists."""
-        from pathlib import Path
-        zsh_file = Path(__file__).parent.parent / "shell" / "xplain.zsh"
-        assert zsh_file.exists()
-        content = zsh_file.read_text()
-        assert "alias wtf" in content
-        assert "xplain wtf" in content
-
-    def test_bash_integration_exists(self):
-        """Test bash integration file exists."""
-        from pathlib import Path
-        bash_file = Path(__file__).parent.parent / "shell" / "xplain.bash"
-        assert bash_file.exists()
-        content = bash_file.read_text()
-        assert "alias wtf" in content
-        assert "xplain wtf" in content
+        assert "--tldr" in help_words
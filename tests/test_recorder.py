@@ -0,0 +1,87 @@
+"""Tests for the GIF encoder behind the asset recording scripts."""
+
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "assets"))
+import _recorder  # noqa: E402
+
+
+def _terminal_frames(count: int) -> list:
+    """Frames of a terminal where one more line of output appears each time."""
+    frames = []
+    for shown in range(count):
+        img = Image.new("RGB", (920, 680), _recorder.BACKGROUND)
+        draw = ImageDraw.Draw(img)
+        for line in range(shown):
+            color = (126, 231, 135) if line % 2 else (201, 209, 217)
+            draw.text((20, 20 + line * 20), f"$ line {line} of terminal output", fill=color)
+        frames.append(np.asarray(img))
+    return frames
+
+
+def _decoded_ink(path: Path) -> list[int]:
+    """Number of non-background pixels in each frame of a GIF."""
+    ink = []
+    with Image.open(path) as gif:
+        for index in range(gif.n_frames):
+            gif.seek(index)
+            rgb = np.asarray(gif.convert("RGB"))
+            ink.append(int((rgb != _recorder.BACKGROUND).any(axis=2).sum()))
+    return ink
+
+
+def test_ffmpeg_gif_keeps_every_frame(tmp_path):
+    """Test distinct frames survive the ffmpeg palettegen/paletteuse encode."""
+    pytest.importorskip("av")
+    out = tmp_path / "out.gif"
+    _recorder._write_gif_ffmpeg(_terminal_frames(6), out, 200)
+
+    ink = _decoded_ink(out)
+    assert len(ink) == 6
+    assert ink[0] == 0
+    assert all(a < b for a, b in zip(ink, ink[1:])), ink
+
+
+def test_distinct_frames_keeps_each_new_line():
+    """Test a line of text appearing is never dropped as a near-duplicate."""
+    stack = np.stack(_terminal_frames(12))
+    assert _recorder._distinct_frames(stack).tolist() == list(range(12))
+
+
+def test_distinct_frames_drops_repeats_and_flicker():
+    """Test exact repeats and a few flickering pixels are dropped."""
+    first, second = _terminal_frames(2)
+    flicker = second.copy()
+    flicker[0, :4] = 255
+    stack = np.stack([first, second, second, flicker, second])
+    assert _recorder._distinct_frames(stack).tolist() == [0, 1, 4]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fake gifsicle is a shell script")
+def test_failed_gifsicle_keeps_unoptimized_gif(tmp_path, monkeypatch, capsys):
+    """Test a gifsicle that rejects its options leaves the GIF from Pillow in place."""
+    fake = tmp_path / "gifsicle"
+    fake.write_text("#!/bin/sh\necho 'unknown option --lossy' >&2\nexit 1\n")
+    fake.chmod(0o755)
+    monkeypatch.setattr(_recorder, "av", None)
+    monkeypatch.setattr(_recorder.shutil, "which", lambda name: str(fake))
+
+    frames = []
+    for frame in _terminal_frames(3):
+        buf = io.BytesIO()
+        Image.fromarray(frame).save(buf, format="JPEG", quality=95)
+        frames.append((len(frames) * 200, buf.getvalue()))
+    out = tmp_path / "out.gif"
+    _recorder.create_gif(frames, out, 600, 200)
+
+    assert "gifsicle failed" in capsys.readouterr().out
+    assert len(_decoded_ink(out)) == 3
+    assert not (tmp_path / "out.opt.gif").exists()
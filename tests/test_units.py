@@ -0,0 +1,893 @@
+"""Tests for xplain internals that do not go through the CLI app."""
+
+import asyncio
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # optional (pip install xplain[dev])
+    from json import loads as json_loads
+
+from src.config import LANGUAGE_NAMES, AVAILABLE_MODELS, DEFAULT_MODEL, Config, config
+from src.commands.diff import _get_git_diff
+from src.commands.pipe import _detect_content_type
+from src.commands.wtf import (
+    _format_as_json,
+    _get_last_command_bash,
+    _get_last_command_zsh,
+    _get_recorded_exit_code,
+    _rerun_command,
+)
+from src.core import copilot
+from src.core import formatter as fmt
+from src.core.copilot import (
+    AIBackend,
+    GhModelsBackend,
+    GitHubModelsBackend,
+    HttpxModelsBackend,
+    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_TLDR,
+    _retry_delay,
+    _single_flight,
+    is_tldr_mode,
+    set_model,
+    set_tldr_mode,
+)
+from src.core.formatter import (
+    detect_code_language,
+    export_explanation,
+    format_language_flag,
+    set_output_file,
+)
+from src.core.history_store import HistoryStore
+from src.core.process import run_bounded
+from src.core.response_cache import ResponseCache, normalize_error
+
+# Shell integration scripts shipped with the package
+SHELL_DIR = Path(__file__).parent.parent / "shell"
+
+
+class TestConfig:
+    """Test configuration."""
+
+    def test_default_language(self):
+        """Test default language is set."""
+        assert config.language in LANGUAGE_NAMES
+
+    def test_language_names(self):
+        """Test all language codes have names."""
+        assert len(LANGUAGE_NAMES) >= 10
+        for code, name in LANGUAGE_NAMES.items():
+            assert len(code) == 2
+            assert len(name) > 0
+
+
+class TestFormatter:
+    """Test formatter utilities."""
+
+    @pytest.mark.parametrize("path,lang", [
+        ("test.py", "python"),
+        ("app.js", "javascript"),
+        ("main.go", "go"),
+        ("Dockerfile", "dockerfile"),
+        ("unknown.xyz", "text"),
+        ("src/Analysis.R", "r"),
+        ("types.d.ts", "typescript"),
+        ("CMakeLists.txt", "cmake"),
+    ])
+    def test_detect_code_language(self, path, lang):
+        """Test programming language detection."""
+        assert detect_code_language(path) == lang
+
+    @pytest.mark.parametrize("code,flag", [
+        ("en", "🇺🇸"),
+        ("vi", "🇻🇳"),
+        ("unknown", "🌐"),
+    ])
+    def test_format_language_flag(self, code, flag):
+        """Test language flag formatting."""
+        assert format_language_flag(code) == flag
+
+
+class TestHistoryStore:
+    """Test history storage."""
+
+    def test_add_and_list(self, store):
+        """Test adding and listing history entries."""
+        store.add("cmd", "ls -la", "Lists files in detail", language="en")
+        store.add("error", "TypeError", "Type mismatch", language="vi")
+
+        entries = store.list_entries()
+        assert len(entries) == 2
+        assert entries[0].command_type == "cmd"
+        assert entries[1].command_type == "error"
+
+    def test_search(self, store):
+        """Test searching history."""
+        store.add("cmd", "docker run nginx", "Runs nginx container")
+        store.add("cmd", "git push origin main", "Pushes to main")
+        store.add("error", "docker: command not found", "Docker not installed")
+
+        results = store.search("docker")
+        assert len(results) == 2
+
+    def test_clear(self, store):
+        """Test clearing history."""
+        store.add("cmd", "test", "test explanation")
+        assert store.count() == 1
+        store.clear()
+        assert store.count() == 0
+
+    def test_background_writes(self, tmp_path_factory):
+        """Test background writes reach disk once flushed."""
+        tmpdir = tmp_path_factory.mktemp("background_writes")
+        store = HistoryStore(history_dir=tmpdir, background_writes=True)
+        store.add("cmd", "first", "first explanation")
+        store.add("cmd", "second", "second explanation")
+        store.flush()
+
+        reloaded = HistoryStore(history_dir=tmpdir)
+        assert [e.query for e in reloaded.list_entries()] == ["first", "second"]
+
+    def test_appends_and_compacts(self, tmp_path_factory):
+        """Test entries are appended as lines and the file is compacted when too long."""
+        tmpdir = tmp_path_factory.mktemp("appends_and_compacts")
+        store = HistoryStore(history_dir=tmpdir)
+        store.MAX_ENTRIES = 4
+        store.COMPACT_AT = 6
+        for i in range(5):
+            store.add("cmd", f"q{i}", "explanation")
+        assert len(store.history_file.read_text().splitlines()) == 5
+
+        store.add("cmd", "q5", "explanation")
+        lines = store.history_file.read_text().splitlines()
+        assert [json_loads(line)["query"] for line in lines] == ["q2", "q3", "q4", "q5"]
+        assert [e.query for e in store.list_entries()] == ["q2", "q3", "q4", "q5"]
+
+    def test_migrates_legacy_json(self, tmp_path_factory):
+        """Test history written as a JSON array by older versions is kept."""
+        tmpdir = tmp_path_factory.mktemp("migrates_legacy_json")
+        legacy = [{"timestamp": 1.0, "command_type": "cmd", "query": "old", "explanation": "x"}]
+        (tmpdir / "history.json").write_text(json.dumps(legacy))
+
+        store = HistoryStore(history_dir=tmpdir)
+        assert [e.query for e in store.list_entries()] == ["old"]
+        store.add("cmd", "new", "y")
+
+        assert not (tmpdir / "history.json").exists()
+        reloaded = HistoryStore(history_dir=tmpdir)
+        assert [e.query for e in reloaded.list_entries()] == ["old", "new"]
+
+    def test_get_by_index(self, store):
+        """Test getting entry by index (1-based from recent)."""
+        store.add("cmd", "first", "first explanation")
+        store.add("cmd", "second", "second explanation")
+        store.add("cmd", "third", "third explanation")
+
+        # Index 1 = most recent
+        entry = store.get(1)
+        assert entry.query == "third"
+
+        entry = store.get(3)
+        assert entry.query == "first"
+
+        assert store.get(0) is None
+        assert store.get(4) is None
+
+
+class TestResponseCache:
+    """Test the on-disk AI response cache."""
+
+    def test_set_and_get(self, tmp_path_factory):
+        """Test a stored response is returned for the same key."""
+        tmpdir = tmp_path_factory.mktemp("set_and_get")
+        cache = ResponseCache(cache_dir=tmpdir)
+        key = cache.make_key("openai/gpt-4o-mini", "system", "explain ls")
+        assert cache.get(key) is None
+        cache.set(key, "Lists files")
+        assert cache.get(key) == "Lists files"
+
+    @pytest.fixture
+    def counting_backend(self, monkeypatch, tmp_path):
+        """A stub backend that counts its calls, with the cache in tmp_path."""
+        class CountingBackend(AIBackend):
+            calls = 0
+
+            def is_available(self):
+                return True
+
+            def ask(self, prompt, system_prompt="", timeout=120):
+                CountingBackend.calls += 1
+                return f"answer {CountingBackend.calls}"
+
+            @property
+            def name(self):
+                return "counting"
+
+        monkeypatch.setattr(copilot, "_backend_instance", CountingBackend())
+        monkeypatch.setattr(copilot, "response_cache", ResponseCache(cache_dir=tmp_path))
+        monkeypatch.setattr(copilot, "_cache_enabled", True)
+        return CountingBackend
+
+    def test_hit_skips_backend(self, counting_backend):
+        """Test a repeated prompt is answered from the cache without calling the backend."""
+        assert copilot.ask_copilot("explain ls") == "answer 1"
+        chunks = []
+        assert copilot.ask_copilot("explain ls", on_chunk=chunks.append) == "answer 1"
+        assert chunks == ["answer 1"]
+        assert counting_backend.calls == 1
+
+    def test_no_cache_always_asks(self, counting_backend):
+        """Test with the cache disabled (--no-cache) every call reaches the backend."""
+        copilot.set_cache_enabled(False)
+        assert copilot.ask_copilot("explain ls") == "answer 1"
+        assert copilot.ask_copilot("explain ls") == "answer 2"
+        assert counting_backend.calls == 2
+        assert copilot.response_cache.get(
+            copilot.response_cache.make_key("counting", SYSTEM_PROMPT, "explain ls")
+        ) is None
+
+    def test_key_depends_on_model_and_prompts(self):
+        """Test different models or prompts never share a key."""
+        key = ResponseCache.make_key("openai/gpt-4o-mini", "system", "explain ls")
+        assert key != ResponseCache.make_key("openai/gpt-4.1", "system", "explain ls")
+        assert key != ResponseCache.make_key("openai/gpt-4o-mini", "tldr", "explain ls")
+        assert key != ResponseCache.make_key("openai/gpt-4o-mini", "system", "explain cd")
+
+    def test_normalize_error(self):
+        """Test errors differing only in locations or directories normalize equally."""
+        first = 'File "/home/alice/proj/app.py", line 10\nTypeError: object at 0x7f3a2b'
+        second = 'File "/Users/bob/work/app.py", line 42\nTypeError: object at 0x10ff00'
+        assert normalize_error(first) == normalize_error(second)
+        assert "app.py" in normalize_error(first)
+        assert normalize_error(first) != normalize_error(second.replace("TypeError", "KeyError"))
+        assert normalize_error("src/app.ts:10:5 - error") == normalize_error("src/app.ts:3:17 - error")
+
+    @pytest.mark.parametrize("first,second", [
+        ("Request failed with status code 404", "Request failed with status code 500"),
+        ("make: *** [all] Error 1", "make: *** [all] Error 2"),
+        ("PermissionError: [Errno 13] denied", "PermissionError: [Errno 2] denied"),
+        ("error TS2322: Type mismatch", "error TS2345: Type mismatch"),
+        ("error[E0382]: borrow of moved value", "error[E0499]: borrow of moved value"),
+    ])
+    def test_normalize_error_keeps_codes(self, first, second):
+        """Test status, exit, errno and error codes still tell errors apart."""
+        assert normalize_error(first) != normalize_error(second)
+
+    def test_normalized_tier_is_opt_in(self, monkeypatch):
+        """Test explain_error only uses the normalized key with XPLAIN_CACHE_NORMALIZE."""
+        calls = []
+        monkeypatch.setattr(copilot, "ask_copilot", lambda prompt, **kwargs: calls.append(kwargs) or "")
+        copilot.explain_error("TypeError")
+        monkeypatch.setattr(copilot, "NORMALIZED_ERROR_CACHE", True)
+        copilot.explain_error("TypeError")
+        assert [c["normalized"] for c in calls] == [False, True]
+
+    def test_expired_entry(self, tmp_path_factory):
+        """Test entries older than the TTL are ignored."""
+        tmpdir = tmp_path_factory.mktemp("expired_entry")
+        cache = ResponseCache(cache_dir=tmpdir)
+        cache.set("abc", "stale")
+        old = time.time() - ResponseCache.TTL - 60
+        os.utime(tmpdir / "abc.txt", (old, old))
+        # A later run only has the file on disk
+        assert ResponseCache(cache_dir=tmpdir).get("abc") is None
+
+    def test_first_write_prunes_expired_files(self, tmp_path_factory):
+        """Test expired files left by earlier runs are deleted on the first write."""
+        tmpdir = tmp_path_factory.mktemp("prune")
+        ResponseCache(cache_dir=tmpdir).set("old", "stale")
+        old = time.time() - ResponseCache.TTL - 60
+        os.utime(tmpdir / "old.txt", (old, old))
+
+        ResponseCache(cache_dir=tmpdir).set("new", "fresh")
+        assert sorted(p.name for p in tmpdir.iterdir()) == ["new.txt"]
+
+    def test_default_dir_follows_config(self, monkeypatch, tmp_path):
+        """Test the default location is config.cache_dir/responses."""
+        monkeypatch.setitem(config.__dict__, "cache_dir", tmp_path)
+        assert ResponseCache().cache_dir == tmp_path / "responses"
+
+    def test_memory_tier(self, tmp_path_factory):
+        """Test recent entries are served from memory and the oldest are evicted."""
+        tmpdir = tmp_path_factory.mktemp("memory_tier")
+        cache = ResponseCache(cache_dir=tmpdir)
+        cache.MEMORY_ENTRIES = 2
+        for key in ("a", "b", "c"):
+            cache.set(key, key.upper())
+        assert list(cache._memory) == ["b", "c"]
+
+        (tmpdir / "c.txt").unlink()
+        assert cache.get("c") == "C"
+        # Evicted entries are still read back from disk
+        assert cache.get("a") == "A"
+        assert list(cache._memory) == ["c", "a"]
+
+
+class TestProcess:
+    """Test bounded subprocess execution."""
+
+    def test_output_within_cap(self):
+        """Test normal output and exit code are returned."""
+        code = "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"
+        result = run_bounded([sys.executable, "-c", code], max_bytes=1024, timeout=10)
+        assert result.returncode == 3
+        assert result.stdout.strip() == b"out"
+        assert result.stderr.strip() == b"err"
+        assert not result.truncated
+        assert not result.timed_out
+
+    def test_output_over_cap_is_truncated(self):
+        """Test runaway output is cut off at the cap."""
+        code = "while True: print('x' * 1000)"
+        result = run_bounded([sys.executable, "-c", code], max_bytes=4096, timeout=10)
+        assert result.truncated
+        assert len(result.stdout) == 4096
+
+    def test_drain_keeps_exit_code_and_stderr_tail(self):
+        """Test verbose output past the cap is discarded without killing the process."""
+        code = (
+            "import sys\n"
+            "for i in range(2000): print('out', i); print('err', i, file=sys.stderr)\n"
+            "sys.exit(4)"
+        )
+        result = run_bounded(
+            [sys.executable, "-c", code], max_bytes=1024, timeout=10, kill_on_overflow=False,
+        )
+        assert result.returncode == 4
+        assert result.truncated
+        assert not result.timed_out
+        assert result.stdout.startswith(b"out 0")
+        assert len(result.stdout) == len(result.stderr) == 1024
+        assert result.stderr.rstrip().endswith(b"err 1999")
+
+    def test_timeout(self):
+        """Test a hanging command is killed after the timeout."""
+        result = run_bounded([sys.executable, "-c", "import time; time.sleep(30)"], max_bytes=1024, timeout=0.5)
+        assert result.timed_out
+
+
+class TestPipeDetection:
+    """Test pipe content type detection."""
+
+    @pytest.mark.parametrize("content,kind", [
+        pytest.param(
+            """Traceback (most recent call last):
+  File "app.py", line 10, in <module>
+    result = process(data)
+TypeError: 'NoneType' object is not subscriptable""",
+            "error",
+            id="error",
+        ),
+        pytest.param(
+            "fatal: not a git repository (or any of the parent directories): .git",
+            "error",
+            id="error-case-insensitive",
+        ),
+        pytest.param(
+            """import os
+from pathlib import Path
+
+def process_files(directory):
+    for f in Path(directory).glob('*.py'):
+        print(f.name)
+""",
+            "code",
+            id="code",
+        ),
+        pytest.param(
+            """total 48
+drwxr-xr-x  12 user  staff   384 Feb 10 10:00 .
+drwxr-xr-x   5 user  staff   160 Feb  9 09:00 ..
+-rw-r--r--   1 user  staff  1234 Feb 10 10:00 README.md""",
+            "auto",
+            id="auto",
+        ),
+        pytest.param(
+            "".join(f"INFO step {i} ok\n" for i in range(29)) + "TypeError: x is not a function",
+            "error",
+            id="log-ending-in-error",
+        ),
+        pytest.param(
+            "".join(f"collecting test_{i}.py\n" for i in range(24))
+            + "ModuleNotFoundError: No module named 'foo'",
+            "error",
+            id="log-ending-in-module-not-found",
+        ),
+        pytest.param("", "unknown", id="empty"),
+    ])
+    def test_detect_content_type(self, content, kind):
+        """Test error, code, general output and empty content detection."""
+        assert _detect_content_type(content) == kind
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+class TestGitDiff:
+    """Test reading git diff output."""
+
+    @pytest.fixture
+    def repo(self, tmp_path, monkeypatch):
+        """A git repo with one commit, as the working directory."""
+        def git(*args):
+            subprocess.run(["git", *args], check=True, capture_output=True)
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("GIT_CONFIG_GLOBAL", os.devnull)
+        git("init", "-q")
+        git("config", "user.email", "test@example.com")
+        git("config", "user.name", "Test")
+        (tmp_path / "a.txt").write_text("one\ntwo\nthree\n")
+        (tmp_path / "b.txt").write_text("keep\n")
+        git("add", ".")
+        git("commit", "-q", "-m", "init")
+        return git
+
+    def test_stats_and_patch(self, repo, tmp_path):
+        """Test the shortstat summary is parsed and stripped from the patch."""
+        (tmp_path / "a.txt").write_text("one\n2\n3\nfour\n")
+        (tmp_path / "b.txt").write_text("")
+
+        diff, description, stats, truncated = _get_git_diff()
+        assert stats == (2, 3, 3)
+        assert description == "unstaged changes"
+        assert diff.startswith("diff --git a/a.txt b/a.txt")
+        assert "changed" not in diff.splitlines()[0]
+        assert "+four" in diff
+        assert not truncated
+
+    def test_staged_insertions_only(self, repo, tmp_path):
+        """Test a summary without deletions parses with zero deletions."""
+        (tmp_path / "c.txt").write_text("new\n")
+        repo("add", "c.txt")
+
+        diff, description, stats, _ = _get_git_diff(staged=True)
+        assert stats == (1, 1, 0)
+        assert description == "staged changes"
+        assert "+new" in diff
+
+    def test_truncates_long_patch(self, repo, tmp_path):
+        """Test a patch over the cap is cut to max_chars and flagged, with full stats."""
+        (tmp_path / "a.txt").write_text("".join(f"line {i}\n" for i in range(2000)))
+
+        diff, _, stats, truncated = _get_git_diff(max_chars=500)
+        assert truncated
+        assert len(diff) <= 500
+        assert diff.startswith("diff --git")
+        assert stats == (1, 2000, 3)
+
+    def test_empty_diff(self, repo):
+        """Test a clean tree gives an empty diff and zero stats."""
+        assert _get_git_diff() == ("", "unstaged changes", (0, 0, 0), False)
+
+
+class TestBackends:
+    """Test AI backend selection."""
+
+    def test_backend_module_shape(self):
+        """Test the legacy backend names alias one AIBackend that supports ask_messages."""
+        assert GhModelsBackend is GitHubModelsBackend
+        assert HttpxModelsBackend is GitHubModelsBackend
+        assert issubclass(GitHubModelsBackend, AIBackend)
+        assert callable(GitHubModelsBackend().ask_messages)
+
+    def test_gh_models_backend_name(self):
+        """Test GhModelsBackend name."""
+        backend = GhModelsBackend()
+        assert "GitHub Models" in backend.name
+
+    def test_httpx_models_backend_name(self):
+        """Test HttpxModelsBackend name."""
+        backend = HttpxModelsBackend()
+        assert "GitHub Models" in backend.name
+
+    def test_default_ask_stream_yields_full_response(self):
+        """Test backends without native streaming yield the whole answer once."""
+        class EchoBackend(AIBackend):
+            def is_available(self):
+                return True
+
+            def ask(self, prompt, system_prompt="", timeout=120):
+                return f"echo: {prompt}"
+
+            @property
+            def name(self):
+                return "echo"
+
+        assert list(EchoBackend().ask_stream("hi")) == ["echo: hi"]
+
+    def test_streaming_backend_method_exists(self):
+        """Test GitHubModelsBackend streams natively."""
+        assert GitHubModelsBackend.ask_stream is not AIBackend.ask_stream
+        assert callable(GitHubModelsBackend().ask_messages_stream)
+
+    def test_construction_is_offline(self, monkeypatch):
+        """Test creating a backend neither opens a client nor looks up a token."""
+        def no_token():
+            raise AssertionError("token looked up at construction")
+
+        copilot._close_http_client()
+        monkeypatch.setattr(copilot, "_get_github_token", no_token)
+        backend = GitHubModelsBackend(model="openai/gpt-4.1")
+        assert "GitHub Models" in backend.name
+        assert copilot._HTTP_CLIENT is None
+
+    def test_http_client_is_shared(self):
+        """Test the backend reuses one pooled HTTP client across requests."""
+        client = copilot._get_http_client()
+        try:
+            assert copilot._get_http_client() is client
+            assert str(client.base_url).startswith("https://models.github.ai")
+        finally:
+            copilot._close_http_client()
+        assert copilot._HTTP_CLIENT is None
+
+    def test_ask_many_keeps_order(self):
+        """Test concurrent requests come back in the order they were given."""
+        def handler(request):
+            question = json_loads(request.content)["messages"][-1]["content"]
+            return httpx.Response(200, json={"choices": [{"message": {"content": f"re: {question}"}}]})
+
+        old_token = copilot._cached_token
+        copilot._cached_token = copilot._TokenEntry("test-token", float("inf"))
+        try:
+            answers = asyncio.run(copilot._ask_many(
+                copilot.GitHubModelsBackend(),
+                [[{"role": "user", "content": str(i)}] for i in range(5)],
+                concurrency=2,
+                transport=httpx.MockTransport(handler),
+            ))
+        finally:
+            copilot._cached_token = old_token
+
+        assert answers == [f"re: {i}" for i in range(5)]
+
+    def test_retries_transient_errors(self):
+        """Test 429/5xx responses are retried and other errors are not."""
+        statuses = [503, 429, 200]
+
+        def handler(request):
+            status = statuses.pop(0)
+            if status != 200:
+                return httpx.Response(status, headers={"Retry-After": "0"}, text="busy")
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+        old_token = copilot._cached_token
+        copilot._cached_token = copilot._TokenEntry("test-token", float("inf"))
+        copilot._HTTP_CLIENT = httpx.Client(
+            base_url="https://models.github.ai", transport=httpx.MockTransport(handler)
+        )
+        try:
+            backend = copilot.GitHubModelsBackend()
+            assert backend.ask_messages([{"role": "user", "content": "hi"}]) == "ok"
+
+            statuses[:] = [401, 200]
+            with pytest.raises(copilot.CopilotCLIError, match="401"):
+                backend.ask_messages([{"role": "user", "content": "hi"}])
+        finally:
+            copilot._close_http_client()
+            copilot._cached_token = old_token
+
+    @pytest.fixture
+    def mock_api(self, monkeypatch):
+        """Route the shared HTTP client through a handler; return the list of requests seen."""
+        requests = []
+
+        def install(handler):
+            def record(request):
+                requests.append(request)
+                return handler(request)
+
+            monkeypatch.setattr(copilot, "_cached_token", copilot._TokenEntry("test-token", float("inf")))
+            monkeypatch.setattr(copilot, "_HTTP_CLIENT", httpx.Client(
+                base_url="https://models.github.ai", transport=httpx.MockTransport(record)
+            ))
+            return requests
+
+        yield install
+        copilot._close_http_client()
+
+    @staticmethod
+    def _sse(*events: str) -> bytes:
+        return "".join(f"{event}\n\n" for event in events).encode()
+
+    def test_stream_yields_sse_deltas(self, mock_api):
+        """Test content deltas are yielded in order and parsing stops at [DONE]."""
+        body = self._sse(
+            'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+            ": keep-alive",
+            'data: {"choices": [{"delta": {"content": "Hel"}}]}',
+            'data: {"choices": []}',
+            'data: {"choices": [{"delta": {"content": "lo"}}]}',
+            "data: [DONE]",
+            'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+        )
+        requests = mock_api(lambda request: httpx.Response(200, content=body))
+        chunks = list(GitHubModelsBackend().ask_messages_stream([{"role": "user", "content": "hi"}]))
+        assert chunks == ["Hel", "lo"]
+        assert json_loads(requests[0].content)["stream"] is True
+
+    def test_stream_error_event_raises(self, mock_api):
+        """Test an error event in the stream raises after the deltas before it."""
+        body = self._sse(
+            'data: {"choices": [{"delta": {"content": "partial"}}]}',
+            'data: {"error": {"message": "content filtered"}}',
+        )
+        mock_api(lambda request: httpx.Response(200, content=body))
+        chunks = []
+        with pytest.raises(copilot.CopilotCLIError, match="content filtered"):
+            for chunk in GitHubModelsBackend().ask_messages_stream([{"role": "user", "content": "hi"}]):
+                chunks.append(chunk)
+        assert chunks == ["partial"]
+
+    def test_stream_retries_before_first_delta(self, mock_api, monkeypatch):
+        """Test a busy status or connection error before any text is retried."""
+        body = self._sse('data: {"choices": [{"delta": {"content": "ok"}}]}', "data: [DONE]")
+        outcomes = ["connect", 503, 200]
+
+        def handler(request):
+            outcome = outcomes.pop(0)
+            if outcome == "connect":
+                raise httpx.ConnectError("refused", request=request)
+            if outcome != 200:
+                return httpx.Response(outcome, headers={"Retry-After": "0"}, text="busy")
+            return httpx.Response(200, content=body)
+
+        requests = mock_api(handler)
+        monkeypatch.setattr(copilot, "_retry_delay", lambda attempt, retry_after=None: 0)
+        chunks = list(GitHubModelsBackend().ask_messages_stream([{"role": "user", "content": "hi"}]))
+        assert chunks == ["ok"]
+        assert len(requests) == 3
+
+    def test_stream_not_retried_after_first_delta(self, mock_api):
+        """Test a connection drop mid-stream is raised instead of repeating shown text."""
+        def body():
+            yield self._sse('data: {"choices": [{"delta": {"content": "half"}}]}')
+            raise httpx.ReadError("connection reset")
+
+        requests = mock_api(lambda request: httpx.Response(200, content=body()))
+        chunks = []
+        with pytest.raises(httpx.ReadError):
+            for chunk in GitHubModelsBackend().ask_messages_stream([{"role": "user", "content": "hi"}]):
+                chunks.append(chunk)
+        assert chunks == ["half"]
+        assert len(requests) == 1
+
+    def test_single_flight(self):
+        """Test identical concurrent requests share one call."""
+        calls = []
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return "answer"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(_single_flight("key", slow)))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        # Give the other threads time to find the call in flight
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(results) == [("answer", False), ("answer", False), ("answer", True)]
+
+    def test_chat_history_fits_context_budget(self):
+        """Test chat sends only the recent history that fits the token budget."""
+        sent = []
+
+        class RecordingBackend(copilot.AIBackend):
+            def is_available(self):
+                return True
+
+            def ask(self, prompt, system_prompt="", timeout=120):
+                return ""
+
+            def ask_messages(self, messages, timeout=120):
+                sent.extend(messages)
+                return "ok"
+
+            @property
+            def name(self):
+                return "recording"
+
+        history = [
+            {"role": "user", "content": "old " * 8000},
+            {"role": "assistant", "content": "recent answer"},
+            {"role": "user", "content": "follow up"},
+        ]
+        old_backend = copilot._backend_instance
+        copilot._backend_instance = RecordingBackend()
+        try:
+            copilot.chat_with_copilot("follow up", history, "English")
+        finally:
+            copilot._backend_instance = old_backend
+
+        assert [m["content"] for m in sent[1:]] == ["recent answer", "follow up"]
+
+    def test_chat_context_tokens_env(self, monkeypatch):
+        """Test XPLAIN_CTX_TOKENS is read per call and bad values fall back to the default."""
+        monkeypatch.setenv("XPLAIN_CTX_TOKENS", "1200")
+        assert copilot._chat_context_tokens() == 1200
+        monkeypatch.setenv("XPLAIN_CTX_TOKENS", "lots")
+        assert copilot._chat_context_tokens() == copilot.DEFAULT_CHAT_CONTEXT_TOKENS
+
+    def test_retry_delay(self):
+        """Test Retry-After is honored and the backoff is capped."""
+        assert _retry_delay(0, "2") == 2
+        assert _retry_delay(0, "Wed, 21 Oct 2015 07:28:00 GMT") == 0
+        assert 1 <= _retry_delay(0) < 2
+        assert 4 <= _retry_delay(2) < 5
+        assert _retry_delay(10) == 60
+
+    def test_token_cache_expires(self, monkeypatch):
+        """Test the cached token is re-read once it is close to expiry."""
+        monkeypatch.setenv("GH_TOKEN", "fresh-token")
+        monkeypatch.setattr(
+            copilot, "_cached_token", copilot._TokenEntry("cached-token", time.monotonic() + 3600)
+        )
+        assert copilot._get_github_token() == "cached-token"
+
+        copilot._cached_token = copilot._TokenEntry("cached-token", time.monotonic() + 10)
+        assert copilot._get_github_token() == "fresh-token"
+
+
+class TestExport:
+    """Test output export functionality."""
+
+    def test_export_all_formats(self, tmp_path_factory):
+        """Test exporting to markdown, JSON and plain text files by extension."""
+        tmpdir = tmp_path_factory.mktemp("export")
+        for ext in ("md", "json", "txt"):
+            export_explanation("Hello **world**", str(tmpdir / f"test.{ext}"), title="Test")
+
+        assert (tmpdir / "test.md").read_text() == "# Test\n\nHello **world**\n"
+        assert json_loads((tmpdir / "test.json").read_text()) == {
+            "title": "Test",
+            "content": "Hello **world**",
+        }
+        assert (tmpdir / "test.txt").read_text() == "Hello **world**\n"
+
+    def test_set_output_file(self, monkeypatch):
+        """Test set_output_file sets the global."""
+        monkeypatch.setattr(fmt, "_output_file", fmt._output_file)
+        set_output_file("/tmp/test.md")
+        assert fmt._output_file == "/tmp/test.md"
+        set_output_file(None)
+        assert fmt._output_file is None
+
+
+class TestModelSelection:
+    """Test AI model selection."""
+
+    def test_available_models_dict(self):
+        """Test AVAILABLE_MODELS has entries."""
+        assert len(AVAILABLE_MODELS) >= 5
+        assert DEFAULT_MODEL in AVAILABLE_MODELS
+
+    def test_config_has_model(self, monkeypatch):
+        """Test config has a model, defaulting to DEFAULT_MODEL without XPLAIN_MODEL."""
+        assert isinstance(config.model, str) and config.model
+        monkeypatch.delenv("XPLAIN_MODEL", raising=False)
+        assert Config().model == DEFAULT_MODEL == "openai/gpt-4o-mini"
+
+    def test_set_model(self, monkeypatch):
+        """Test set_model changes the selected model."""
+        monkeypatch.setattr(copilot, "_selected_model", None)
+        set_model("openai/gpt-4.1")
+        assert copilot._selected_model == "openai/gpt-4.1"
+
+    def test_backend_uses_model(self):
+        """Test GitHubModelsBackend accepts model parameter."""
+        backend = GitHubModelsBackend(model="openai/gpt-4.1")
+        assert backend.model == "openai/gpt-4.1"
+        assert "gpt-4.1" in backend.name
+
+
+class TestWTFHelpers:
+    """Test WTF command helpers."""
+
+    def test_get_last_command_zsh(self, histfile):
+        """Test zsh history parsing."""
+        histfile(".zsh_history", ": 1707600000:0;echo hello\n: 1707600001:0;git push origin main\n")
+        assert _get_last_command_zsh() == "git push origin main"
+
+    def test_get_last_command_bash(self, histfile):
+        """Test bash history parsing."""
+        histfile(".bash_history", "echo hello\nnpm run build\n")
+        assert _get_last_command_bash() == "npm run build"
+
+    def test_get_last_command_bash_large_history(self, histfile):
+        """Test bash history parsing only needs the tail of a large file."""
+        lines = "".join(f"echo {i}\n" for i in range(5000))
+        histfile(".bash_history", lines + "make test\n\n")
+        assert _get_last_command_bash() == "make test"
+
+    def test_rerun_verbose_success(self):
+        """Test a command that succeeds after printing a lot keeps exit code 0."""
+        exit_code, stdout, _ = _rerun_command(f"{shlex.quote(sys.executable)} -c \"print('x' * 100000)\"")
+        assert exit_code == 0
+        assert stdout.startswith("xxx")
+
+    def test_format_as_json(self):
+        """Test JSON output formatter."""
+        result = _format_as_json("It failed because...", "git push", 1, "en")
+        data = json_loads(result)
+        assert data["type"] == "wtf_explanation"
+        assert data["command"] == "git push"
+        assert data["exit_code"] == 1
+        assert data["language"] == "en"
+        assert data["explanation"] == "It failed because..."
+
+    def test_get_recorded_exit_code(self, monkeypatch):
+        """Test reading the exit code exported by the shell hook."""
+        monkeypatch.setenv("XPLAIN_LAST_EXIT", "127")
+        assert _get_recorded_exit_code() == 127
+        monkeypatch.setenv("XPLAIN_LAST_EXIT", "garbage")
+        assert _get_recorded_exit_code() is None
+        monkeypatch.delenv("XPLAIN_LAST_EXIT")
+        assert _get_recorded_exit_code() is None
+
+
+class TestTLDRMode:
+    """Test TL;DR mode."""
+
+    def test_set_tldr_mode(self, monkeypatch):
+        """Test set_tldr_mode toggles the flag."""
+        monkeypatch.setattr(copilot, "_tldr_mode", copilot._tldr_mode)
+        set_tldr_mode(True)
+        assert is_tldr_mode() is True
+        assert copilot._tldr_mode is True
+
+        set_tldr_mode(False)
+        assert is_tldr_mode() is False
+        assert copilot._tldr_mode is False
+
+    def test_tldr_system_prompt_exists(self):
+        """Test SYSTEM_PROMPT_TLDR is defined and different from SYSTEM_PROMPT."""
+        assert SYSTEM_PROMPT_TLDR != SYSTEM_PROMPT
+        assert "single" in SYSTEM_PROMPT_TLDR.lower() or "one" in SYSTEM_PROMPT_TLDR.lower()
+
+
+class TestShellIntegration:
+    """Test shell integration files exist and are valid."""
+
+    @pytest.mark.parametrize("name", ["xplain.zsh", "xplain.bash"])
+    def test_integration_exists(self, name):
+        """Test the zsh and bash integration files exist and define the wtf alias."""
+        content = (SHELL_DIR / name).read_text()
+        assert "alias wtf" in content
+        assert "xplain wtf" in content
+
+    @pytest.mark.skipif(shutil.which("bash") is None, reason="bash not installed")
+    @pytest.mark.parametrize("initial,expected", [
+        ('PROMPT_COMMAND="echo hi"', 'declare -- PROMPT_COMMAND="_xplain_record_exit;echo hi"'),
+        ('PROMPT_COMMAND=("echo a")', 'declare -a PROMPT_COMMAND=([0]="_xplain_record_exit" [1]="echo a")'),
+    ])
+    def test_bash_hook_added_once(self, initial, expected):
+        """Test re-sourcing the bash integration adds the hook once, in string or array form."""
+        script = f"{initial}; source {SHELL_DIR / 'xplain.bash'}; source {SHELL_DIR / 'xplain.bash'}; declare -p PROMPT_COMMAND"
+        result = subprocess.run(["bash", "-c", script], capture_output=True, text=True)
+        assert result.stdout.strip() == expected
+
+    @pytest.mark.parametrize("name,flush", [("xplain.zsh", "fc -AI"), ("xplain.bash", "history -a")])
+    def test_hook_flushes_history(self, name, flush):
+        """Test the exit-code hook also writes the command to HISTFILE, so wtf pairs them up."""
+        assert flush in (SHELL_DIR / name).read_text()